@@ -0,0 +1,87 @@
+"""
+Server-side set of the fire markers currently on a session's map.
+Detections are kept in time order and expire once they fall outside the
+playback's marker window; past MAX_CONCURRENT_MARKERS the lowest-priority
+markers are evicted so clients never have to sweep their own markers.
+"""
+
+import heapq
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Any, Tuple
+
+# Normalized confidence labels, least likely to be kept first
+CONFIDENCE_PRIORITY = {'low': 0, 'medium': 1, 'high': 2}
+
+
+def marker_priority(record: Dict[str, Any]) -> Tuple[int, float, str]:
+    """Sort key ranking which markers to keep: confidence, then FRP, then recency."""
+    confidence = CONFIDENCE_PRIORITY.get(record.get('confidence'), 0)
+    return confidence, record.get('frp') or 0.0, record['datetime_utc']
+
+
+class ActiveFireSet:
+    """Live detections of one playback session, keyed by event id."""
+
+    def __init__(self, max_markers: int):
+        """Initialize an empty set capped at max_markers."""
+        self.max_markers = max_markers
+        # (datetime_utc, id) ring buffer in detection order; evicted ids are skipped on expiry
+        self.order = deque()
+        self.records: Dict[int, Dict[str, Any]] = {}
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def reset(self, records: List[Dict[str, Any]]):
+        """Replace the set with the fires active at a new cursor (after a seek)."""
+        self.order.clear()
+        self.records.clear()
+        self.add(records)
+
+    def expire(self, cutoff: datetime) -> List[int]:
+        """Remove detections older than cutoff and return their ids."""
+        cutoff_key = cutoff.strftime('%Y-%m-%d %H:%M:%S')
+        expired = []
+        while self.order and self.order[0][0] < cutoff_key:
+            _, fire_id = self.order.popleft()
+            if self.records.pop(fire_id, None) is not None:
+                expired.append(fire_id)
+        return expired
+
+    def add(self, records: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """
+        Add new detections, evicting the lowest-priority markers over the cap.
+
+        Returns the added records that survived the cap and the ids of
+        previously sent markers that were evicted to make room.
+        """
+        for record in records:
+            self.records[record['id']] = record
+            self.order.append((record['datetime_utc'], record['id']))
+
+        excess = len(self.records) - self.max_markers
+        if excess <= 0:
+            return records, []
+
+        dropped = {record['id'] for record in
+                   heapq.nsmallest(excess, self.records.values(), key=marker_priority)}
+        for fire_id in dropped:
+            del self.records[fire_id]
+        self.evicted += excess
+
+        added = [record for record in records if record['id'] not in dropped]
+        new_ids = {record['id'] for record in records}
+        return added, [fire_id for fire_id in dropped if fire_id not in new_ids]
+
+    def update(self, records: List[Dict[str, Any]],
+               cutoff: datetime) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """Expire detections older than cutoff, then add records; returns (adds, removed ids)."""
+        expired = self.expire(cutoff)
+        added, evicted = self.add(records)
+        return added, expired + evicted
+
+    def get_records(self) -> List[Dict[str, Any]]:
+        """Live records in detection order."""
+        return [self.records[fire_id] for _, fire_id in self.order if fire_id in self.records]
@@ -10,14 +10,16 @@ import sqlite3
 import json
 import time
 import threading
-from datetime import datetime, timedelta
+import uuid
+from datetime import datetime, timedelta, timezone
 from queue import Queue, Empty
-from typing import Dict, List, Any, Optional
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple
 import logging
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit, disconnect
+from flask_socketio import SocketIO, emit, disconnect, join_room, leave_room
 
 try:
     import config as fire_config
@@ -31,6 +33,36 @@ except ImportError:
     print("Warning: Fire tracking service not found. SVM predictions will be disabled.")
     fire_tracking_bp = None
 
+from active_fires import ActiveFireSet
+from fire_stats import RollingFireStatistics
+from fire_query import (FIRES_FORMATS, LIST_FILTERS, build_query, build_scan_query, iter_chunks, iter_rows,
+                        normalize_dates, parse_timestamp, stream_fires)
+from fire_rollups import (ROLLUP_CELL_DEGREES, count_range, data_version, ensure_rollups, query_rollup,
+                          total_count)
+from spatial_index import bbox_condition, ensure_spatial_index
+from tile_store import TileCache, open_tile_store
+from wire_format import (ENCODINGS, DEFAULT_ENCODING, STREAM_FORMATS, encode_payload,
+                         encode_stream_record, get_frame_layout)
+
+try:
+    from fire_index import FireEventIndex
+except ImportError:
+    print("Warning: NumPy not available. Playback will query SQLite directly.")
+    FireEventIndex = None
+
+try:
+    import numpy as np
+    from heat_tiles import bin_points, encode_png, heat_grid, render_heatmap, shade_heatmap, tile_bounds
+    from fire_tiles import FIRE_TILE_FORMATS, build_tile, encode_tile, make_tile
+    from tile_synthesis import synthesize_tile
+except ImportError:
+    print("Warning: NumPy not available. Heatmap, fire tiles and tile synthesis will be disabled.")
+    render_heatmap = None
+    synthesize_tile = None
+
+# Query parameters that select the fires drawn on a heatmap tile
+HEAT_FILTERS = ['start_date', 'end_date', 'min_frp'] + LIST_FILTERS
+
 
 # Configure logging
 logging.basicConfig(
@@ -45,35 +77,72 @@ logger = logging.getLogger(__name__)
 
 
 class FireDataProducer:
-    """Producer thread that reads fire data from database and feeds queue."""
+    """Producer that reads fire data for one playback session, one interval per tick."""
     
-    def __init__(self, data_queue: Queue, db_path: str):
-        """Initialize producer with queue and database."""
-        self.data_queue = data_queue
+    def __init__(self, db_path: str, event_index=None):
+        """Initialize producer with database and optional in-memory index."""
         self.db_path = db_path
+        self.event_index = event_index
         self.is_running = False
         self.is_paused = False
         self.current_speed = fire_config.DEFAULT_SPEED if fire_config else 'slow'
+        self.fields = fire_config.get_playback_fields() if fire_config else []
+        self.viewport = None
+        self.aggregate = False
+        self.unpaced = False  # Produce intervals as fast as they are consumed, ignoring wall time
         self.start_date = None
         self.end_date = None
         self.current_datetime = None
-        self.thread = None
+        
+        # Deadline scheduling on the monotonic clock (seconds of wall time per tick)
+        self.tick_interval = fire_config.get_tick_interval() if fire_config else 1.0
+        self.next_deadline = 0.0
+        
+        # Read-ahead: (interval end, batches) for the intervals right after
+        # current_datetime, filled by the prefetch thread up to prefetch_datetime
+        self.prefetched = deque()
+        self.prefetch_datetime = None
+        self.prefetch_generation = 0
+        self.prefetch_hits = 0
+        self.prefetch_misses = 0
         
         # Statistics
         self.total_records = 0
         self.processed_records = 0
+        self.ticks = 0
+        self.overruns = 0
+        self.coalesced_intervals = 0
+        self.last_tick_lag = 0.0
+        self.max_tick_lag = 0.0
+        self.total_tick_lag = 0.0
         
     def set_date_range(self, start_date: str, end_date: str):
         """Set date range for playback."""
-        self.start_date = datetime.fromisoformat(start_date)
-        self.end_date = datetime.fromisoformat(end_date)
+        self.start_date = parse_timestamp(start_date)
+        self.end_date = parse_timestamp(end_date)
         self.current_datetime = self.start_date
         logger.info(f"Producer date range set: {start_date} to {end_date}")
     
+    def set_fields(self, fields: Optional[List[str]]):
+        """Set the record fields sent to clients (validated against config.PLAYBACK_FIELDS)."""
+        self.fields = fire_config.get_playback_fields(fields)
+        self.invalidate_prefetch()
+    
+    def set_viewport(self, viewport: Optional[Dict[str, Any]]):
+        """
+        Limit playback to a viewport from config.get_viewport_bounds(), or clear it.
+        
+        Read-ahead is dropped so the new bounds apply from the next tick.
+        """
+        self.viewport = viewport
+        self.invalidate_prefetch()
+    
     def set_speed(self, speed_key: str):
         """Update playback speed."""
         if fire_config and speed_key in fire_config.PLAYBACK_SPEEDS:
-            self.current_speed = speed_key
+            if speed_key != self.current_speed:
+                self.current_speed = speed_key
+                self.invalidate_prefetch()
             logger.info(f"Producer speed changed to {speed_key}")
     
     def pause(self):
@@ -82,8 +151,9 @@ class FireDataProducer:
         logger.info("Producer paused")
     
     def resume(self):
-        """Resume the producer."""
+        """Resume the producer (the next interval is due immediately)."""
         self.is_paused = False
+        self.next_deadline = time.monotonic()
         logger.info("Producer resumed")
     
     def stop(self):
@@ -99,51 +169,69 @@ class FireDataProducer:
             'current_datetime': self.current_datetime.isoformat() if self.current_datetime else None,
             'speed': self.current_speed,
             'is_running': self.is_running,
-            'is_paused': self.is_paused
+            'is_paused': self.is_paused,
+            'ticks': self.ticks,
+            'last_tick_lag_ms': round(self.last_tick_lag * 1000, 2),
+            'max_tick_lag_ms': round(self.max_tick_lag * 1000, 2),
+            'avg_tick_lag_ms': round(self.total_tick_lag * 1000 / self.ticks, 2) if self.ticks else 0.0,
+            'overruns': self.overruns,
+            'coalesced_intervals': self.coalesced_intervals,
+            'prefetched_intervals': len(self.prefetched),
+            'prefetch_hits': self.prefetch_hits,
+            'prefetch_misses': self.prefetch_misses
         }
     
+    def use_event_index(self) -> bool:
+        """Check whether the in-memory index can serve playback queries."""
+        return self.event_index is not None and self.event_index.ensure_loaded()
+    
     def query_interval(self, start_dt: datetime, end_dt: datetime) -> List[Dict[str, Any]]:
         """Query fire records within a specific time interval."""
         if not fire_config:
             return []
-            
+        
+        if self.use_event_index():
+            return self.event_index.query_interval(
+                start_dt, end_dt, fire_config.get_fade_duration(self.current_speed),
+                self.fields, self.viewport
+            )
+        
+        return self.query_interval_sqlite(start_dt, end_dt)
+    
+    def query_interval_sqlite(self, start_dt: datetime, end_dt: datetime) -> List[Dict[str, Any]]:
+        """Query fire records for an interval directly from SQLite (fallback path)."""
         try:
             conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
-            query = """
-                SELECT * FROM fire_events 
-                WHERE datetime_utc > ? AND datetime_utc <= ?
-                ORDER BY datetime_utc
-            """
-            
             start_str = start_dt.strftime('%Y-%m-%d %H:%M:%S')
             end_str = end_dt.strftime('%Y-%m-%d %H:%M:%S')
+            params = [start_str, end_str]
+            
+            # Viewport bounds and the interval prune the R*Tree; exact bounds are rechecked
+            viewport_filter = ''
+            if self.viewport:
+                south, north = self.viewport['south'], self.viewport['north']
+                west, east = self.viewport['west'], self.viewport['east']
+                spatial_filter, spatial_params = bbox_condition(south, north, west, east, start_dt, end_dt)
+                viewport_filter = f'AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ? AND {spatial_filter}'
+                params += [south, north, west, east] + spatial_params
+            
+            # Field names are validated against config.PLAYBACK_FIELDS
+            query = f"""
+                SELECT {', '.join(self.fields)} FROM fire_events 
+                WHERE datetime_utc > ? AND datetime_utc <= ? {viewport_filter}
+                ORDER BY datetime_utc
+            """
             
-            cursor.execute(query, (start_str, end_str))
+            cursor.execute(query, params)
             rows = cursor.fetchall()
             
+            fade_duration = fire_config.get_fade_duration(self.current_speed)
             records = []
             for row in rows:
-                record = {
-                    'id': row['id'],
-                    'datetime_utc': row['datetime_utc'],
-                    'latitude': row['latitude'],
-                    'longitude': row['longitude'],
-                    'brightness': row['brightness'],
-                    'bright_t31': row['bright_t31'],
-                    'frp': row['frp'],
-                    'confidence': row['confidence'],
-                    'scan': row['scan'],
-                    'track': row['track'],
-                    'satellite': row['satellite'],
-                    'instrument': row['instrument'],
-                    'daynight': row['daynight'],
-                    'type': row['type'],
-                    'version': row['version'],
-                    'fade_duration': fire_config.get_fade_duration(self.current_speed)
-                }
+                record = dict(zip(self.fields, row))
+                record['fade_duration'] = fade_duration
                 records.append(record)
             
             conn.close()
@@ -153,153 +241,643 @@ class FireDataProducer:
             logger.error(f"Database query error: {e}")
             return []
     
-    def run_producer(self):
-        """Main producer loop - queries every 1 second."""
-        logger.info("Producer thread started")
+    def count_records(self, start_dt: Optional[datetime] = None, end_dt: Optional[datetime] = None) -> int:
+        """Count records with start <= datetime_utc <= end (defaults to the playback range)."""
+        start_dt = start_dt or self.start_date
+        end_dt = end_dt or self.end_date
+        if self.use_event_index():
+            return self.event_index.count_range(start_dt, end_dt)
+        
+        # Whole hours come from the rollup prefix counts
+        conn = sqlite3.connect(self.db_path)
+        count = count_range(conn, start_dt, end_dt)
+        conn.close()
+        return count
+    
+    def get_active_window(self) -> timedelta:
+        """Simulated time a marker stays on the map (visible plus fade, 2 x fade_duration)."""
+        hours_per_second = fire_config.PLAYBACK_SPEEDS[self.current_speed]
+        fade_duration = fire_config.get_fade_duration(self.current_speed)
+        return timedelta(hours=hours_per_second * 2 * fade_duration)
+    
+    def seek(self, target_dt: datetime) -> List[Dict[str, Any]]:
+        """
+        Move the cursor to target_dt (clamped to the playback range).
+        
+        Uses index range lookups only, and returns the fires still inside
+        their fade window at the new cursor so the map can be redrawn.
+        Timezone-aware targets are converted to naive UTC like the range.
+        """
+        if target_dt.tzinfo is not None:
+            target_dt = target_dt.astimezone(timezone.utc).replace(tzinfo=None)
+        target_dt = min(max(target_dt, self.start_date), self.end_date)
+        window_start = max(self.start_date, target_dt - self.get_active_window())
+        
+        active_records = self.query_interval(window_start, target_dt)
+        self.processed_records = self.count_records(self.start_date, target_dt)
+        self.current_datetime = target_dt
+        self.invalidate_prefetch()
+        self.next_deadline = time.monotonic() + self.tick_interval
         
+        logger.info(f"Producer seeked to {target_dt} ({len(active_records)} active fires)")
+        return active_records
+    
+    def prepare(self) -> bool:
+        """Reset the cursor to the start of the date range and count its records."""
         if not self.start_date or not self.end_date or not fire_config:
             logger.error("Date range not set or config missing")
-            return
+            return False
         
+        self.total_records = self.count_records()
+        self.processed_records = 0
+        self.current_datetime = self.start_date
+        self.invalidate_prefetch()
         self.is_running = True
         
-        try:
-            # Get total record count
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT COUNT(*) FROM fire_events 
-                WHERE datetime_utc >= ? AND datetime_utc <= ?
-            """, (self.start_date.strftime('%Y-%m-%d %H:%M:%S'), self.end_date.strftime('%Y-%m-%d %H:%M:%S')))
-            self.total_records = cursor.fetchone()[0]
-            conn.close()
-            
-            logger.info(f"Producer will process {self.total_records} records")
-            
-            self.current_datetime = self.start_date
-            last_interval_time = time.time()
-            
-            logger.info(f"Starting producer loop from {self.current_datetime} to {self.end_date}")
-            while self.is_running and self.current_datetime <= self.end_date:
-                current_time = time.time()
-                elapsed = current_time - last_interval_time
-                
-                if elapsed >= 1.0 and not self.is_paused:
-                    hours_per_second = fire_config.PLAYBACK_SPEEDS[self.current_speed]
-                    next_datetime = self.current_datetime + timedelta(hours=hours_per_second)
-                    
-                    if next_datetime > self.end_date:
-                        next_datetime = self.end_date
-                    
-                    logger.debug(f"Processing interval: {self.current_datetime} to {next_datetime}")
-                    records = self.query_interval(self.current_datetime, next_datetime)
-                    logger.debug(f"Found {len(records)} records in interval")
-                    
-                    batch_data = {
-                        'type': 'fire_batch',
-                        'records': records,
-                        'timestamp': next_datetime.isoformat(),
-                        'speed': self.current_speed
-                    }
-                    
-                    try:
-                        self.data_queue.put(batch_data)
-                        if records:
-                            self.processed_records += len(records)
-                            logger.info(f"Queued {len(records)} records, total processed: {self.processed_records}")
-                    except Exception as e:
-                        logger.warning(f"Failed to queue batch: {e}")
-                    
-                    self.current_datetime = next_datetime
-                    last_interval_time = current_time
-                    
-                    # Add a small delay to prevent overwhelming the system
-                    time.sleep(0.1)
-                
-                time.sleep(0.01)
-            
-        except Exception as e:
-            logger.error(f"Producer thread error: {e}")
-        finally:
-            try:
-                self.data_queue.put({'type': 'end_of_data'})
-            except:
-                pass
-            self.is_running = False
-            logger.info("Producer thread finished")
+        logger.info(f"Producer will process {self.total_records} records "
+                    f"from {self.current_datetime} to {self.end_date}")
+        return True
     
-    def start(self):
-        """Start producer thread."""
-        if not self.thread or not self.thread.is_alive():
-            self.is_running = True
-            self.thread = threading.Thread(target=self.run_producer)
-            self.thread.daemon = True
-            self.thread.start()
+    def schedule_first_tick(self, now: float):
+        """Make the first interval due one tick after now."""
+        self.next_deadline = now + self.tick_interval
+    
+    def is_due(self, now: float) -> bool:
+        """Check whether the next interval's deadline has passed (always, when unpaced)."""
+        return not self.is_paused and (self.unpaced or self.next_deadline <= now)
+    
+    def claim_intervals(self, now: float) -> int:
+        """
+        Record the lag behind the current deadline and advance to the next one.
+        
+        Deadlines advance by whole tick intervals from the previous deadline, so
+        query time never accumulates as drift. When a tick overruns by one or
+        more intervals, the missed intervals are coalesced into this tick and
+        the count of intervals to produce is returned.
+        
+        Unpaced playback has no deadlines and always produces one interval.
+        """
+        if self.unpaced:
+            self.ticks += 1
+            return 1
+        
+        lag = max(0.0, now - self.next_deadline)
+        intervals = 1 + int(lag // self.tick_interval)
+        self.next_deadline += intervals * self.tick_interval
+        
+        self.ticks += 1
+        self.last_tick_lag = lag
+        self.max_tick_lag = max(self.max_tick_lag, lag)
+        self.total_tick_lag += lag
+        if intervals > 1:
+            self.overruns += 1
+            self.coalesced_intervals += intervals - 1
+            logger.debug(f"Playback tick overran by {lag:.3f}s, coalescing {intervals} intervals")
+        return intervals
+    
+    def has_more(self) -> bool:
+        """Check whether the playback cursor has intervals left to produce."""
+        return self.is_running and self.current_datetime < self.end_date
+    
+    def interval_end(self, start_dt: datetime, intervals: int = 1) -> datetime:
+        """End of the playback interval(s) starting at start_dt, clamped to end_date."""
+        hours_per_second = fire_config.PLAYBACK_SPEEDS[self.current_speed]
+        hours_per_tick = hours_per_second * self.tick_interval
+        return min(start_dt + timedelta(hours=hours_per_tick * intervals), self.end_date)
+    
+    def aggregation_zoom(self, start_dt: datetime, end_dt: datetime) -> Optional[int]:
+        """
+        Grid zoom to aggregate an interval at, or None to send raw points.
+        
+        Clients that accept clusters get them below config.AGGREGATE_BELOW_ZOOM,
+        or when the interval holds more points than get_aggregate_threshold().
+        Binning needs the columnar index.
+        """
+        if not self.aggregate or not self.use_event_index():
+            return None
+        
+        zoom = self.viewport['zoom'] if self.viewport else fire_config.DEFAULT_ZOOM
+        zoom = min(max(zoom, min(fire_config.ZOOM_LEVELS)), max(fire_config.ZOOM_LEVELS))
+        if self.viewport and zoom < fire_config.AGGREGATE_BELOW_ZOOM:
+            return zoom
+        
+        count = self.event_index.count_interval(start_dt, end_dt, self.viewport)
+        if count > fire_config.get_aggregate_threshold(self.current_speed):
+            return zoom
+        return None
+    
+    def build_batches(self, start_dt: datetime, end_dt: datetime) -> List[Dict[str, Any]]:
+        """
+        Query an interval and split it into queue-ready batches.
+        
+        Intervals with more records than config.get_batch_size() are split
+        into several batches so frame size stays even; every batch but the
+        last is stamped with its final record's time. Dense intervals are
+        sent as a single batch of grid clusters instead (see aggregation_zoom).
+        """
+        zoom = self.aggregation_zoom(start_dt, end_dt)
+        if zoom is not None:
+            clusters = self.event_index.aggregate_interval(
+                start_dt, end_dt, zoom, fire_config.AGGREGATE_GRID_SIZE,
+                fire_config.get_fade_duration(self.current_speed), self.viewport
+            )
+            logger.debug(f"Aggregated interval {start_dt} to {end_dt} into {len(clusters)} clusters")
+            return [{
+                'type': 'fire_batch',
+                'records': [],
+                'clusters': clusters,
+                'count': sum(cluster['count'] for cluster in clusters),
+                'timestamp': end_dt.isoformat(),
+                'speed': self.current_speed
+            }]
+        
+        logger.debug(f"Processing interval: {start_dt} to {end_dt}")
+        records = self.query_interval(start_dt, end_dt)
+        logger.debug(f"Found {len(records)} records in interval")
+        
+        batch_size = fire_config.get_batch_size(self.current_speed)
+        chunks = [records[i:i + batch_size] for i in range(0, len(records), batch_size)] or [[]]
+        
+        batches = []
+        for i, chunk in enumerate(chunks):
+            if i < len(chunks) - 1:
+                timestamp = datetime.fromisoformat(chunk[-1]['datetime_utc']).isoformat()
+            else:
+                timestamp = end_dt.isoformat()
+            batches.append({
+                'type': 'fire_batch',
+                'records': chunk,
+                'count': len(chunk),
+                'timestamp': timestamp,
+                'speed': self.current_speed
+            })
+        return batches
+    
+    def next_batches(self, intervals: int = 1) -> List[Dict[str, Any]]:
+        """
+        Take the next playback interval(s) and advance the cursor past them.
+        
+        Each tick covers hours_per_second * tick_interval of data. Prefetched
+        intervals are used first; anything not read ahead yet is queried here
+        in one go.
+        """
+        batches = []
+        while intervals and self.prefetched and self.current_datetime < self.end_date:
+            end_dt, interval_batches = self.prefetched.popleft()
+            self.prefetch_hits += 1
+            batches.extend(interval_batches)
+            self.current_datetime = end_dt
+            intervals -= 1
+        
+        if intervals and self.current_datetime < self.end_date:
+            end_dt = self.interval_end(self.current_datetime, intervals)
+            self.prefetch_misses += 1
+            batches.extend(self.build_batches(self.current_datetime, end_dt))
+            self.current_datetime = end_dt
+            self.prefetch_datetime = end_dt
+        
+        self.processed_records += sum(batch['count'] for batch in batches)
+        return batches
+    
+    def invalidate_prefetch(self):
+        """Drop read-ahead intervals (after a speed change, seek or restart)."""
+        self.prefetched.clear()
+        self.prefetch_datetime = self.current_datetime
+        self.prefetch_generation += 1
+    
+    def next_prefetch(self) -> Optional[Tuple[datetime, datetime, int]]:
+        """Return (start, end, generation) of the next interval to read ahead, if any."""
+        if not self.is_running or self.is_paused or self.prefetch_datetime is None:
+            return None
+        if self.prefetch_datetime >= self.end_date:
+            return None
+        if len(self.prefetched) >= fire_config.get_prefetch_depth(self.current_speed):
+            return None
+        start_dt = self.prefetch_datetime
+        return start_dt, self.interval_end(start_dt), self.prefetch_generation
+    
+    def store_prefetch(self, start_dt: datetime, end_dt: datetime, generation: int,
+                       batches: List[Dict[str, Any]]) -> bool:
+        """Append a read-ahead interval unless it was invalidated while being queried."""
+        if generation != self.prefetch_generation or start_dt != self.prefetch_datetime:
+            return False
+        self.prefetched.append((end_dt, batches))
+        self.prefetch_datetime = end_dt
+        return True
 
 
-class FireDataConsumer:
-    """Consumer thread that processes queue and emits to clients."""
+class PlaybackSession:
+    """Playback state shared by the clients emitted to through one Socket.IO target."""
     
-    def __init__(self, data_queue: Queue, socketio_app):
-        """Initialize consumer with queue and SocketIO app."""
-        self.data_queue = data_queue
-        self.socketio = socketio_app
-        self.is_running = False
-        self.thread = None
+    def __init__(self, target: str, producer: FireDataProducer, room: Optional[str] = None):
+        """Initialize session emitting to a sid (private) or a Socket.IO room (shared)."""
+        self.target = target
+        self.room = room
+        self.producer = producer
+        self.members: Dict[str, str] = {}  # sid -> negotiated wire encoding
+        self.is_active = True
+        
+        # Guards the producer cursor between scheduler ticks and seeks;
+        # batches from before the latest seek carry a stale generation
+        self.lock = threading.Lock()
+        self.generation = 0
+        
+        # Frames are numbered; the last PLAYBACK_HISTORY_FRAMES are kept for reconnect replay
+        self.session_id = uuid.uuid4().hex
+        self.seq = 0
+        self.keyframe_seq = 0
+        self.history = deque(maxlen=fire_config.PLAYBACK_HISTORY_FRAMES)
+        
+        # Set while a private session waits for its disconnected client to resume
+        self.resume_deadline: Optional[float] = None
+        self.detached_encoding = DEFAULT_ENCODING
+        self.was_paused = False
+        
+        # Markers currently on the map; expiry and the marker cap are enforced here
+        self.active_fires = ActiveFireSet(fire_config.MAX_CONCURRENT_MARKERS)
+        
+        # Recent (monotonic time, fire_update payload) pairs, replayed to late joiners for clusters
+        self.recent_updates = deque()
+        
+        # Frames waiting for the consumer (guarded by lock); merged above the high-water mark
+        self.outbound = deque()
+        self.is_queued = False
+        self.frames_dropped = 0
+        self.records_dropped = 0
+        self.lagging: Dict[str, int] = {}  # room members skipped -> frames missed
+        
+        # Incremental counters over emitted records, published every STATISTICS_UPDATE_INTERVAL
+        self.rolling_statistics = RollingFireStatistics(fire_config.STATISTICS_WINDOWS,
+                                                        fire_config.STATISTICS_FRP_ACCURACY,
+                                                        fire_config.STATISTICS_FRP_QUANTILES)
+        self.rolling_summary: Optional[Dict[str, Any]] = None
+        self.next_statistics = 0.0
         
         self.fire_statistics = {
             'total_fires': 0,
             'active_count': 0,
-            'current_time': None
+            'current_time': None,
+            'markers_evicted': 0,
+            'frames_dropped': 0
+        }
+    
+    def is_due(self, now: float) -> bool:
+        """
+        Check whether the session should produce its next interval.
+        
+        Unpaced sessions are due whenever their outbound buffer has room, so
+        they run exactly as fast as the consumer and client drain them.
+        """
+        if self.producer.unpaced and len(self.outbound) >= fire_config.PLAYBACK_UNPACED_BUFFER:
+            return False
+        return self.is_active and self.producer.is_due(now)
+    
+    def push_frames(self, frames: List[Dict[str, Any]]):
+        """Buffer frames for the consumer (caller holds the lock); unpaced frames are never merged."""
+        self.outbound.extend(frames)
+        if not self.producer.unpaced and len(self.outbound) > fire_config.PLAYBACK_OUTBOUND_HIGH_WATER:
+            self.coalesce_outbound()
+    
+    def coalesce_outbound(self):
+        """
+        Merge buffered fire batches into one catch-up frame (caller holds the lock).
+        
+        Keeps at most MAX_CONCURRENT_MARKERS of the newest records; the frames
+        merged away are counted in frames_dropped and reported to the client.
+        """
+        frames = [frame for frame in self.outbound if frame['generation'] == self.generation]
+        batches = [frame for frame in frames if frame['type'] == 'fire_batch']
+        others = [frame for frame in frames if frame['type'] != 'fire_batch']
+        if len(batches) <= 1:
+            self.outbound = deque(frames)
+            return
+        
+        records = [record for batch in batches for record in batch['records']]
+        kept = records[-fire_config.MAX_CONCURRENT_MARKERS:]
+        merged = {
+            'type': 'fire_batch',
+            'records': kept,
+            'count': sum(batch['count'] for batch in batches) - (len(records) - len(kept)),
+            'timestamp': batches[-1]['timestamp'],
+            'speed': batches[-1]['speed'],
+            'generation': self.generation,
+            'catch_up': True
         }
+        clusters = [cluster for batch in batches for cluster in batch.get('clusters', [])]
+        if clusters:
+            merged['clusters'] = clusters
+        
+        self.frames_dropped += len(batches) - 1
+        self.records_dropped += len(records) - len(kept)
+        self.outbound = deque([merged] + others)
+        logger.debug(f"Coalesced {len(batches)} frames for {self.target}")
+    
+    def needs_keyframe(self) -> bool:
+        """Check whether the next frame should carry the full active set (caller holds the lock)."""
+        return self.seq + 1 - self.keyframe_seq >= fire_config.PLAYBACK_KEYFRAME_INTERVAL
+    
+    def sequence_frame(self, emit_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Number a frame and keep it in the replay history (caller holds the lock)."""
+        self.seq += 1
+        emit_data['seq'] = self.seq
+        if emit_data.get('keyframe'):
+            self.keyframe_seq = self.seq
+        self.history.append(emit_data)
+        return emit_data
     
-    def emit_fire_update(self, batch_data: Dict[str, Any]):
-        """Emit fire update to all connected clients."""
-        records = batch_data['records']
+    def frames_since(self, seq: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Retained frames numbered after seq (caller holds the lock).
+        
+        Starts at the latest retained keyframe after seq, since it supersedes
+        the deltas before it. Returns None when the history no longer reaches
+        back to seq, in which case the client needs a fresh keyframe instead.
+        """
+        if seq >= self.seq:
+            return []
+        if not self.history or self.history[0]['seq'] > seq + 1:
+            return None
+        frames = [frame for frame in self.history if frame['seq'] > seq]
+        keyframes = [index for index, frame in enumerate(frames) if frame.get('keyframe')]
+        return frames[keyframes[-1]:] if keyframes else frames
+    
+    def update_rolling_statistics(self, records: List[Dict[str, Any]],
+                                  now_dt: datetime) -> Optional[Dict[str, Any]]:
+        """Feed records to the rolling statistics; returns a summary when one is due (caller holds the lock)."""
+        self.rolling_statistics.add_records(records)
+        self.rolling_statistics.advance(now_dt)
+        now = time.monotonic()
+        if now < self.next_statistics:
+            return None
+        self.next_statistics = now + fire_config.STATISTICS_UPDATE_INTERVAL / 1000.0
+        self.rolling_summary = self.rolling_statistics.get_summary()
+        return self.rolling_summary
+    
+    def build_frame(self, batch_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Turn a produced batch into a numbered fire_update payload (None if nothing changed).
+        
+        The frame is a delta: the markers added to the session's active set and
+        the ids of markers that expired or were evicted since the last frame.
+        Every PLAYBACK_KEYFRAME_INTERVAL frames it is a keyframe that also
+        carries the whole active set under 'active'; 'fires' stays the new
+        detections, so clients that ignore keyframes never redraw the set.
+        """
+        count = batch_data['count']
         
-        if records:
-            self.fire_statistics['total_fires'] += len(records)
-            self.fire_statistics['current_time'] = batch_data['timestamp']
-            self.fire_statistics['active_count'] = len(records)
+        with self.lock:
+            if batch_data['generation'] != self.generation:
+                return None
+            frame_dt = datetime.fromisoformat(batch_data['timestamp'])
+            cutoff = frame_dt - self.producer.get_active_window()
+            added, expired = self.active_fires.update(batch_data['records'], cutoff)
+            rolling = self.update_rolling_statistics(batch_data['records'], frame_dt)
             
+            fire_statistics = self.fire_statistics
+            fire_statistics['total_fires'] += count
+            fire_statistics['current_time'] = batch_data['timestamp']
+            fire_statistics['active_count'] = len(self.active_fires)
+            fire_statistics['markers_evicted'] = self.active_fires.evicted
+            fire_statistics['frames_dropped'] = self.frames_dropped
+            
+            if not (count or expired):
+                return None
             emit_data = {
-                'fires': records,
+                'fires': added,
+                'expired': expired,
                 'timestamp': batch_data['timestamp'],
                 'speed': batch_data['speed'],
-                'statistics': self.fire_statistics
+                'statistics': dict(fire_statistics)
             }
-            
-            # Emit to all connected clients
-            self.socketio.emit('fire_update', emit_data, namespace='/')
-            
+            if rolling:
+                emit_data['statistics']['rolling'] = rolling
+            if self.needs_keyframe():
+                emit_data.update(active=self.active_fires.get_records(), keyframe=True)
+            if 'clusters' in batch_data:
+                emit_data['clusters'] = batch_data['clusters']
+                emit_data['aggregated'] = True
+            if batch_data.get('catch_up'):
+                emit_data['catch_up'] = True
+            return self.sequence_frame(emit_data)
+    
+    def replay(self):
+        """
+        Yield every frame of the range back to back, without a scheduler (HTTP streaming).
+        
+        Uses the same batches and frame building as scheduled playback, so the
+        output matches what a paced client would receive.
+        """
+        producer = self.producer
+        while self.is_active and producer.has_more():
+            with self.lock:
+                batches = producer.next_batches(1)
+            for batch_data in batches:
+                batch_data['generation'] = self.generation
+                emit_data = self.build_frame(batch_data)
+                if emit_data:
+                    yield emit_data
+        self.is_active = False
+    
+    def encoding_target(self, encoding: str) -> str:
+        """Socket.IO target reaching the members that use an encoding."""
+        return f"{self.target}/{encoding}" if self.room else self.target
+    
+    def emit_targets(self) -> List[Tuple[str, str]]:
+        """(encoding, target) pairs covering every member, one per encoding in use."""
+        return [(encoding, self.encoding_target(encoding)) for encoding in set(self.members.values())]
+    
+    def record_update(self, emit_data: Dict[str, Any]):
+        """Remember an emitted update for room snapshots, dropping expired ones."""
+        if not self.room:
+            return
+        now = time.monotonic()
+        self.recent_updates.append((now, emit_data))
+        cutoff = now - fire_config.PLAYBACK_ROOM_SNAPSHOT_SECONDS
+        while self.recent_updates and self.recent_updates[0][0] < cutoff:
+            self.recent_updates.popleft()
+    
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Build a keyframe of the active set and recent clusters as of the last frame (caller holds the lock)."""
+        updates = [update for _, update in list(self.recent_updates)]
+        clusters = [cluster for update in updates for cluster in update.get('clusters', [])]
+        producer = self.producer
+        statistics = dict(self.fire_statistics)
+        if self.rolling_summary:
+            statistics['rolling'] = self.rolling_summary
+        return {
+            'fires': [],
+            'active': self.active_fires.get_records(),
+            'clusters': clusters,
+            'timestamp': updates[-1]['timestamp'] if updates else producer.current_datetime.isoformat(),
+            'speed': producer.current_speed,
+            'statistics': statistics,
+            'expired': [],
+            'keyframe': True,
+            'snapshot': True,
+            'seq': self.seq
+        }
+
+
+class FireDataConsumer:
+    """
+    Consumer thread that drains per-session outbound buffers and emits to clients.
+    
+    The data queue carries sessions with new frames rather than the frames
+    themselves, so the scheduler never blocks on it. A private session whose
+    client has too many Engine.IO packets pending is skipped and retried;
+    lagging room members are taken out of the room's broadcast until they
+    catch up, then sent a catch-up snapshot.
+    """
+    
+    def __init__(self, data_queue: Queue, socketio_app,
+                 scheduler_condition: Optional[threading.Condition] = None):
+        """Initialize consumer with queue, SocketIO app and the scheduler to wake for unpaced sessions."""
+        self.data_queue = data_queue
+        self.socketio = socketio_app
+        self.scheduler_condition = scheduler_condition
+        self.is_running = False
+        self.thread = None
+        
+        # Sessions holding frames for clients that are behind
+        self.waiting = set()
+        self.retry_interval = fire_config.get_tick_interval()
+        self.backlog_probe_failed = False
+    
+    def notify(self, session: PlaybackSession):
+        """Queue a session whose outbound buffer has new frames."""
+        with session.lock:
+            if session.is_queued:
+                return
+            session.is_queued = True
+        self.data_queue.put(session)
+    
+    def client_backlog(self, sid: str) -> int:
+        """
+        Number of packets Engine.IO still has to send to a client (0 if unknown).
+
+        Reads python-socketio / python-engineio internals (pinned in
+        requirements.txt). If they change, backpressure is disabled with a
+        single warning rather than failing every send.
+        """
+        try:
+            server = self.socketio.server
+            eio_sid = server.manager.eio_sid_from_sid(sid, '/')
+            return server.eio.sockets[eio_sid].queue.qsize()
+        except KeyError:
+            # Client already disconnected
+            return 0
+        except (AttributeError, TypeError) as e:
+            if not self.backlog_probe_failed:
+                self.backlog_probe_failed = True
+                logger.warning(f"Engine.IO backlog probe failed, client backpressure disabled: {e!r}")
+            return 0
+    
+    def send_snapshot(self, session: PlaybackSession, sid: str):
+        """Send one client the fires still visible in the session."""
+        with session.lock:
+            if not session.active_fires and not session.recent_updates:
+                return
+            snapshot = session.get_snapshot()
+        snapshot['statistics']['frames_dropped'] = session.lagging.get(sid, 0)
+        payload = encode_payload(snapshot, session.members.get(sid, DEFAULT_ENCODING))
+        self.socketio.emit('fire_update', payload, to=sid, namespace='/')
+    
+    def update_lagging_members(self, session: PlaybackSession):
+        """Move room members in or out of the broadcast based on their send backlog."""
+        for sid, encoding in list(session.members.items()):
+            backlog = self.client_backlog(sid)
+            if sid in session.lagging:
+                if backlog <= fire_config.PLAYBACK_CLIENT_LOW_WATER:
+                    self.send_snapshot(session, sid)
+                    del session.lagging[sid]
+                    self.socketio.server.enter_room(sid, session.encoding_target(encoding), namespace='/')
+                    logger.info(f"Client {sid} caught up in {session.target}")
+                else:
+                    session.lagging[sid] += 1
+            elif backlog >= fire_config.PLAYBACK_CLIENT_HIGH_WATER:
+                self.socketio.server.leave_room(sid, session.encoding_target(encoding), namespace='/')
+                session.lagging[sid] = 1
+                logger.info(f"Client {sid} is behind in {session.target}, skipping frames")
+    
+    def emit_fire_update(self, session: PlaybackSession, batch_data: Dict[str, Any]):
+        """Emit fire update once to the session's sid or room."""
+        emit_data = session.build_frame(batch_data)
+        if not emit_data:
+            return
+        
+        if session.room:
+            self.update_lagging_members(session)
+        
+        session.record_update(emit_data)
+        # Encoded once per encoding in use, not once per client
+        for encoding, target in session.emit_targets():
+            self.socketio.emit('fire_update', encode_payload(emit_data, encoding),
+                               to=target, namespace='/')
+    
+    def deliver(self, session: PlaybackSession, data: Dict[str, Any]):
+        """Emit one outbound frame, skipping frames from before the latest seek."""
+        if data['generation'] != session.generation:
+            return
+        
+        if data['type'] == 'end_of_data':
+            logger.info(f"Playback ended for {session.target}")
+            session.is_active = False
+            self.socketio.emit('playback_ended', to=session.target, namespace='/')
+        elif data['type'] == 'fire_batch':
+            logger.debug(f"Consumer processing fire batch with {len(data['records'])} records "
+                         f"for {session.target}")
+            self.emit_fire_update(session, data)
+        else:
+            logger.warning(f"Unknown data type: {data['type']}")
+    
+    def drain(self, session: PlaybackSession) -> bool:
+        """Emit a session's buffered frames; returns True if its client is too far behind."""
+        while True:
+            with session.lock:
+                if not session.is_active:
+                    session.outbound.clear()
+                    return False
+                if not session.outbound:
+                    return False
+                if not session.room and \
+                        self.client_backlog(session.target) >= fire_config.PLAYBACK_CLIENT_HIGH_WATER:
+                    return True
+                data = session.outbound.popleft()
+                # An unpaced session's buffer just got room, so it can produce again
+                refill = session.producer.unpaced and \
+                    len(session.outbound) == fire_config.PLAYBACK_UNPACED_BUFFER - 1
+            if refill and self.scheduler_condition:
+                with self.scheduler_condition:
+                    self.scheduler_condition.notify()
+            self.deliver(session, data)
     
     def run_consumer(self):
         """Main consumer loop."""
         logger.info("Consumer thread started")
         self.is_running = True
+        next_retry = time.monotonic()
         
         try:
             while self.is_running:
                 try:
-                    data = self.data_queue.get(timeout=1.0)
-                    logger.info(f"Consumer received data: {data['type']}")
-                    
-                    if data['type'] == 'end_of_data':
-                        logger.info("Received end of data signal")
-                        self.socketio.emit('playback_ended')
-                        break
-                    elif data['type'] == 'fire_batch':
-                        logger.info(f"Consumer processing fire batch with {len(data['records'])} records")
-                        self.emit_fire_update(data)
-                    else:
-                        logger.warning(f"Unknown data type: {data['type']}")
-                    
-                    self.data_queue.task_done()
-                    
+                    sessions = [self.data_queue.get(timeout=self.retry_interval if self.waiting else 1.0)]
                 except Empty:
-                    continue
-                except Exception as e:
-                    logger.error(f"Consumer error: {e}")
+                    sessions = []
+                
+                now = time.monotonic()
+                if self.waiting and now >= next_retry:
+                    sessions.extend(self.waiting)
+                    self.waiting.clear()
+                    next_retry = now + self.retry_interval
+                
+                for session in set(sessions):
+                    try:
+                        with session.lock:
+                            session.is_queued = False
+                        if self.drain(session):
+                            self.waiting.add(session)
+                    except Exception as e:
+                        logger.error(f"Consumer error: {e}")
                     
         except Exception as e:
             logger.error(f"Consumer thread error: {e}")
@@ -320,6 +898,462 @@ class FireDataConsumer:
         self.is_running = False
 
 
+class PlaybackSessionManager:
+    """
+    Playback sessions driven by one shared scheduler thread.
+    
+    Clients get a private session keyed by their sid, or opt into a named
+    room where one producer serves every member and each batch is emitted
+    once to the Socket.IO room. A shared prefetch thread keeps each session's
+    next intervals queried ahead of the scheduler.
+    """
+    
+    def __init__(self, db_path: str, socketio_app, event_index=None):
+        """Initialize manager with database, SocketIO app and optional index."""
+        self.db_path = db_path
+        self.event_index = event_index
+        self.socketio = socketio_app
+        self.data_queue = Queue()
+        self.condition = threading.Condition()
+        self.consumer = FireDataConsumer(self.data_queue, socketio_app, self.condition)
+        self.sessions: Dict[str, PlaybackSession] = {}
+        self.client_sessions: Dict[str, PlaybackSession] = {}
+        self.client_viewports: Dict[str, Dict[str, Any]] = {}
+        self.prefetch_wakeup = threading.Event()
+        self.is_running = False
+        self.thread = None
+        self.prefetch_thread = None
+    
+    def get_session(self, sid: str) -> Optional[PlaybackSession]:
+        """Return the active session a client belongs to, if any."""
+        with self.condition:
+            return self.client_sessions.get(sid)
+    
+    def get_room_session(self, room: str) -> Optional[PlaybackSession]:
+        """Return the active session of a named room, if any."""
+        with self.condition:
+            return self.sessions.get(f"{fire_config.PLAYBACK_ROOM_PREFIX}{room}")
+    
+    def start_session(self, sid: str, start_date: str, end_date: str, speed: str,
+                      room: Optional[str] = None, encoding: str = DEFAULT_ENCODING,
+                      fields: Optional[List[str]] = None, clusters: bool = False,
+                      unpaced: bool = False) -> Tuple[PlaybackSession, bool]:
+        """
+        Start playback for a client, or join the named room if it is already playing.
+        
+        Returns the session and whether the client joined an existing room.
+        """
+        if encoding not in ENCODINGS:
+            raise ValueError(f'Invalid encoding: {encoding}')
+        
+        self.stop_session(sid)
+        target = f"{fire_config.PLAYBACK_ROOM_PREFIX}{room}" if room else sid
+        
+        with self.condition:
+            session = self.sessions.get(target) if room else None
+            if session and session.is_active:
+                self.add_member(session, sid, encoding)
+                return session, True
+        
+        producer = FireDataProducer(self.db_path, self.event_index)
+        producer.set_date_range(start_date, end_date)
+        producer.set_speed(speed)
+        producer.set_fields(fields)
+        producer.aggregate = clusters
+        producer.unpaced = unpaced
+        if not room:
+            producer.set_viewport(self.client_viewports.get(sid))
+        if not producer.prepare():
+            raise ValueError('Date range not set or config missing')
+        
+        session = PlaybackSession(target, producer, room)
+        with self.condition:
+            existing = self.sessions.get(target)
+            if room and existing and existing.is_active:
+                # Another client created the room while this one was preparing
+                self.add_member(existing, sid, encoding)
+                return existing, True
+            # First interval is emitted one tick after start
+            producer.schedule_first_tick(time.monotonic())
+            self.sessions[target] = session
+            self.add_member(session, sid, encoding)
+            self.condition.notify()
+        
+        self.start()
+        self.prefetch_wakeup.set()
+        return session, False
+    
+    def add_member(self, session: PlaybackSession, sid: str, encoding: str):
+        """Attach a client to a session (caller holds the lock)."""
+        session.members[sid] = encoding
+        self.client_sessions[sid] = session
+        if session.room:
+            join_room(session.target, sid=sid, namespace='/')
+            join_room(session.encoding_target(encoding), sid=sid, namespace='/')
+    
+    def send_snapshot(self, session: PlaybackSession, sid: str):
+        """Send a late joiner the fires still visible in the room."""
+        self.consumer.send_snapshot(session, sid)
+    
+    def pause_session(self, sid: str) -> Optional[PlaybackSession]:
+        """Pause playback for a client's session."""
+        session = self.get_session(sid)
+        if session:
+            session.producer.pause()
+        return session
+    
+    def resume_session(self, sid: str) -> Optional[PlaybackSession]:
+        """Resume playback for a client's session."""
+        session = self.get_session(sid)
+        if session:
+            with self.condition:
+                session.producer.resume()
+                self.condition.notify()
+            self.prefetch_wakeup.set()
+        return session
+    
+    def set_speed(self, sid: str, speed: str) -> Optional[PlaybackSession]:
+        """Change playback speed for a client's session."""
+        session = self.get_session(sid)
+        if session:
+            with session.lock:
+                session.producer.set_speed(speed)
+            self.prefetch_wakeup.set()
+        return session
+    
+    def seek_session(self, session: PlaybackSession, timestamp: str) -> Dict[str, Any]:
+        """
+        Move a session's cursor to timestamp and emit the fires active there.
+        
+        Raises ValueError for timestamps that are not ISO strings.
+        """
+        if not isinstance(timestamp, str):
+            raise ValueError(f"Invalid timestamp: {timestamp!r}")
+        target_dt = parse_timestamp(timestamp)
+        
+        with session.lock:
+            session.generation += 1
+            session.active_fires.reset(session.producer.seek(target_dt))
+            session.rolling_statistics.reset_windows()
+            producer = session.producer
+            
+            fire_statistics = session.fire_statistics
+            fire_statistics['current_time'] = producer.current_datetime.isoformat()
+            fire_statistics['active_count'] = len(session.active_fires)
+            
+            seek_data = session.sequence_frame({
+                'fires': [],
+                'active': session.active_fires.get_records(),
+                'expired': [],
+                'timestamp': producer.current_datetime.isoformat(),
+                'speed': producer.current_speed,
+                'statistics': dict(fire_statistics),
+                'keyframe': True,
+                'processed_records': producer.processed_records,
+                'total_records': producer.total_records
+            })
+            session.recent_updates.clear()
+            session.record_update(seek_data)
+        
+        with self.condition:
+            self.condition.notify()
+        self.prefetch_wakeup.set()
+        
+        self.socketio.emit('playback_seeked', seek_data, to=session.target, namespace='/')
+        return seek_data
+    
+    def set_viewport(self, sid: str, viewport: Dict[str, Any]) -> Optional[PlaybackSession]:
+        """
+        Record a client's map viewport and apply it to its private session.
+        
+        Room playback is shared by members looking at different parts of the
+        map, so rooms are never culled.
+        """
+        with self.condition:
+            self.client_viewports[sid] = viewport
+            session = self.client_sessions.get(sid)
+        
+        if session and not session.room:
+            with session.lock:
+                session.producer.set_viewport(viewport)
+            self.prefetch_wakeup.set()
+        return session
+    
+    def forget_client(self, sid: str):
+        """
+        Drop all state kept for a disconnected client.
+        
+        A private session is paused rather than stopped, and waits
+        PLAYBACK_RESUME_GRACE_SECONDS for the client to reconnect and resume it.
+        """
+        with self.condition:
+            self.client_viewports.pop(sid, None)
+            self.reap_detached(time.monotonic())
+            session = self.client_sessions.get(sid)
+            if session and not session.room and session.is_active:
+                del self.client_sessions[sid]
+                session.detached_encoding = session.members.pop(sid, DEFAULT_ENCODING)
+                session.was_paused = session.producer.is_paused
+                session.producer.pause()
+                session.resume_deadline = time.monotonic() + fire_config.PLAYBACK_RESUME_GRACE_SECONDS
+                # Wake the scheduler so it reaps the session when the grace period ends
+                self.condition.notify()
+                logger.info(f"Session {session.session_id} detached, waiting for {sid} to reconnect")
+                return
+        self.stop_session(sid)
+    
+    def reap_detached(self, now: float):
+        """
+        Stop private sessions whose client did not reconnect in time (caller holds the condition).
+        
+        Runs on every scheduler pass (which wakes for the earliest resume
+        deadline), and drops the session's buffers so nothing outlives it.
+        """
+        for target, session in list(self.sessions.items()):
+            if session.resume_deadline is not None and session.resume_deadline <= now:
+                session.is_active = False
+                session.producer.stop()
+                del self.sessions[target]
+                with session.lock:
+                    session.history.clear()
+                    session.outbound.clear()
+                    session.producer.invalidate_prefetch()
+                logger.info(f"Session {session.session_id} expired without its client reconnecting")
+    
+    def resume_from(self, sid: str, session_id: str, seq: int,
+                    encoding: Optional[str] = None) -> PlaybackSession:
+        """
+        Reattach a reconnecting client to a session and send it the frames after seq.
+        
+        Frames still in the session's history are replayed as they were sent;
+        if the history no longer reaches back to seq the client gets a keyframe
+        of the current active set. Neither path touches the database.
+        """
+        if encoding is not None and encoding not in ENCODINGS:
+            raise ValueError(f'Invalid encoding: {encoding}')
+        
+        self.stop_session(sid)
+        with self.condition:
+            self.reap_detached(time.monotonic())
+            session = next((session for session in self.sessions.values()
+                            if session.session_id == session_id and session.is_active), None)
+            if not session:
+                raise ValueError('Playback session not found or expired')
+            if not session.room:
+                if session.members:
+                    raise ValueError('Playback session is attached to another client')
+                encoding = encoding or session.detached_encoding
+                del self.sessions[session.target]
+                session.target = sid
+                session.resume_deadline = None
+                self.sessions[sid] = session
+            encoding = encoding or DEFAULT_ENCODING
+            
+            with session.lock:
+                self.add_member(session, sid, encoding)
+                frames = session.frames_since(seq)
+                keyframe = frames is None
+                if keyframe:
+                    frames = [session.get_snapshot()]
+                
+                self.socketio.emit('playback_resumed', {
+                    'session_id': session.session_id,
+                    'seq': session.seq,
+                    'replayed': len(frames),
+                    'keyframe': keyframe
+                }, to=sid, namespace='/')
+                # Sent under the lock so no newer frame is numbered before the replay
+                for frame in frames:
+                    self.socketio.emit('fire_update', encode_payload(frame, encoding), to=sid, namespace='/')
+            
+            if not session.room and not session.was_paused:
+                session.producer.resume()
+                self.condition.notify()
+        
+        self.prefetch_wakeup.set()
+        logger.info(f"Client {sid} resumed session {session.session_id} from seq {seq} "
+                    f"({len(frames)} {'keyframe' if keyframe else 'frames replayed'})")
+        return session
+    
+    def stop_session(self, sid: str):
+        """Detach a client; the session stops once its last member has left."""
+        with self.condition:
+            session = self.client_sessions.pop(sid, None)
+            if not session:
+                return
+            encoding = session.members.pop(sid, DEFAULT_ENCODING)
+            session.lagging.pop(sid, None)
+            if session.room:
+                leave_room(session.target, sid=sid, namespace='/')
+                leave_room(session.encoding_target(encoding), sid=sid, namespace='/')
+            if not session.members:
+                session.is_active = False
+                session.producer.stop()
+                if self.sessions.get(session.target) is session:
+                    del self.sessions[session.target]
+                self.condition.notify()
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get manager-wide statistics."""
+        with self.condition:
+            producers = [session.producer for session in self.sessions.values()]
+            return {
+                'active_sessions': len(self.sessions),
+                'active_rooms': sum(1 for session in self.sessions.values() if session.room),
+                'connected_clients': len(self.client_sessions),
+                'detached_sessions': sum(1 for session in self.sessions.values()
+                                         if session.resume_deadline is not None),
+                'queued_batches': sum(len(session.outbound) for session in self.sessions.values()),
+                'frames_dropped': sum(session.frames_dropped for session in self.sessions.values()),
+                'lagging_clients': sum(len(session.lagging) for session in self.sessions.values()),
+                'max_tick_lag_ms': round(max((p.max_tick_lag for p in producers), default=0.0) * 1000, 2),
+                'overruns': sum(p.overruns for p in producers)
+            }
+    
+    def next_wait(self, now: float) -> Optional[float]:
+        """Seconds until the earliest tick or resume deadline (None when nothing is scheduled)."""
+        deadlines = [
+            session.producer.next_deadline for session in self.sessions.values()
+            if session.is_active and not session.producer.is_paused and not session.producer.unpaced
+        ] + [
+            session.resume_deadline for session in self.sessions.values()
+            if session.resume_deadline is not None
+        ]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - now)
+    
+    def finish_session(self, session: PlaybackSession):
+        """Detach every member from a session that reached the end of its range."""
+        with self.condition:
+            if self.sessions.get(session.target) is session:
+                del self.sessions[session.target]
+            for sid in session.members:
+                if self.client_sessions.get(sid) is session:
+                    del self.client_sessions[sid]
+        session.producer.is_running = False
+    
+    def tick_session(self, session: PlaybackSession):
+        """Produce the due interval(s) for a session and queue them for the consumer."""
+        producer = session.producer
+        with session.lock:
+            intervals = producer.claim_intervals(time.monotonic())
+            generation = session.generation
+            if producer.has_more():
+                batches = producer.next_batches(intervals)
+            else:
+                batches = None
+        
+        if batches is None:
+            self.finish_session(session)
+            frames = [{'type': 'end_of_data', 'generation': generation}]
+        else:
+            self.prefetch_wakeup.set()
+            for batch_data in batches:
+                batch_data['generation'] = generation
+            frames = batches
+        
+        with session.lock:
+            session.push_frames(frames)
+        self.consumer.notify(session)
+    
+    def run_scheduler(self):
+        """Main scheduler loop - ticks every due session, sleeping until the next deadline."""
+        logger.info("Playback scheduler thread started")
+        
+        try:
+            while self.is_running:
+                with self.condition:
+                    now = time.monotonic()
+                    self.reap_detached(now)
+                    due = [session for session in self.sessions.values() if session.is_due(now)]
+                    if not due:
+                        self.condition.wait(timeout=self.next_wait(now))
+                        continue
+                
+                for session in due:
+                    try:
+                        self.tick_session(session)
+                    except Exception as e:
+                        logger.error(f"Playback error for {session.target}: {e}")
+                        self.finish_session(session)
+                        session.is_active = False
+                        
+        except Exception as e:
+            logger.error(f"Playback scheduler error: {e}")
+        finally:
+            self.is_running = False
+            logger.info("Playback scheduler thread finished")
+    
+    def prefetch_session(self, session: PlaybackSession) -> bool:
+        """Read one interval ahead for a session; returns False if none was needed."""
+        producer = session.producer
+        with session.lock:
+            request_interval = producer.next_prefetch() if session.is_active else None
+        if not request_interval:
+            return False
+        
+        # Query outside the lock so ticks and seeks never wait on it
+        start_dt, end_dt, generation = request_interval
+        batches = producer.build_batches(start_dt, end_dt)
+        
+        with session.lock:
+            producer.store_prefetch(start_dt, end_dt, generation, batches)
+        return True
+    
+    def run_prefetcher(self):
+        """Prefetch loop - tops up every session's read-ahead, one interval per pass."""
+        logger.info("Playback prefetch thread started")
+        
+        try:
+            while self.is_running:
+                self.prefetch_wakeup.clear()
+                with self.condition:
+                    sessions = list(self.sessions.values())
+                
+                did_work = False
+                for session in sessions:
+                    try:
+                        did_work = self.prefetch_session(session) or did_work
+                    except Exception as e:
+                        logger.error(f"Prefetch error for {session.target}: {e}")
+                
+                if not did_work:
+                    self.prefetch_wakeup.wait(timeout=1.0)
+                    
+        except Exception as e:
+            logger.error(f"Playback prefetch error: {e}")
+        finally:
+            logger.info("Playback prefetch thread finished")
+    
+    def start(self):
+        """Start the scheduler, prefetch and consumer threads if they are not running."""
+        self.consumer.start()
+        with self.condition:
+            if not self.thread or not self.thread.is_alive():
+                self.is_running = True
+                self.thread = threading.Thread(target=self.run_scheduler)
+                self.thread.daemon = True
+                self.thread.start()
+            if not self.prefetch_thread or not self.prefetch_thread.is_alive():
+                self.prefetch_thread = threading.Thread(target=self.run_prefetcher)
+                self.prefetch_thread.daemon = True
+                self.prefetch_thread.start()
+    
+    def stop(self):
+        """Stop all sessions and the scheduler, prefetch and consumer threads."""
+        with self.condition:
+            for session in self.sessions.values():
+                session.is_active = False
+                session.producer.stop()
+            self.sessions.clear()
+            self.client_sessions.clear()
+            self.is_running = False
+            self.condition.notify()
+        self.prefetch_wakeup.set()
+        self.consumer.stop()
+
+
 # Initialize Flask application
 app = Flask(__name__)
 CORS(app)
@@ -338,15 +1372,61 @@ if fire_config:
         ping_timeout=fire_config.WEBSOCKET_PING_TIMEOUT
     )
     
-    # Initialize producer-consumer system
-    data_queue = Queue(maxsize=fire_config.get_queue_size(fire_config.DEFAULT_SPEED))
+    # Initialize per-client playback sessions (shared scheduler + consumer threads)
     db_path = os.path.join(os.path.dirname(__file__), fire_config.DATABASE_PATH)
-    producer = FireDataProducer(data_queue, db_path)
-    consumer = FireDataConsumer(data_queue, socketio)
+    if FireEventIndex and fire_config.USE_COLUMNAR_INDEX:
+        event_index = FireEventIndex(db_path)
+    else:
+        event_index = None
+    playback_manager = PlaybackSessionManager(db_path, socketio, event_index)
+    
+    # Base map tiles: one memory-mapped MBTiles file, or the {z}/{x}/{y}.png directory
+    base_dir = os.path.dirname(__file__)
+    base_tile_store = open_tile_store(
+        os.path.join(base_dir, fire_config.TILE_DIRECTORY),
+        os.path.join(base_dir, fire_config.TILE_MBTILES_PATH),
+        fire_config.TILE_MMAP_SIZE
+    )
+    base_tile_cache = TileCache(
+        fire_config.TILE_CACHE_SIZE,
+        max_bytes=fire_config.TILE_CACHE_MAX_BYTES,
+        negative_ttl=fire_config.TILE_NEGATIVE_TTL
+    )
+    # Tiles synthesized from neighbouring zooms, kept apart so they never evict stored tiles
+    if synthesize_tile:
+        derived_tile_cache = TileCache(
+            fire_config.TILE_DERIVED_CACHE_SIZE,
+            max_bytes=fire_config.TILE_DERIVED_CACHE_MAX_BYTES,
+            negative_ttl=fire_config.TILE_NEGATIVE_TTL
+        )
+    else:
+        derived_tile_cache = None
+    
+    # Rendered heatmap and fire tiles (memory LRU over a disk cache)
+    if render_heatmap:
+        heat_tile_cache = TileCache(
+            fire_config.HEATMAP_CACHE_SIZE,
+            os.path.join(os.path.dirname(__file__), fire_config.HEATMAP_CACHE_DIRECTORY),
+            max_disk_bytes=fire_config.HEATMAP_CACHE_DISK_BYTES
+        )
+        fire_tile_cache = TileCache(
+            fire_config.FIRE_TILE_CACHE_SIZE,
+            os.path.join(os.path.dirname(__file__), fire_config.FIRE_TILE_CACHE_DIRECTORY),
+            extension='tile',
+            max_disk_bytes=fire_config.FIRE_TILE_CACHE_DISK_BYTES
+        )
+    else:
+        heat_tile_cache = None
+        fire_tile_cache = None
 else:
     socketio = None
-    producer = None
-    consumer = None
+    event_index = None
+    playback_manager = None
+    base_tile_store = None
+    base_tile_cache = None
+    derived_tile_cache = None
+    heat_tile_cache = None
+    fire_tile_cache = None
 
 
 # ========== MAIN API ROUTES ==========
@@ -395,9 +1475,8 @@ def status():
     if fire_config and os.path.exists(db_path):
         try:
             conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM fire_events")
-            fire_count = cursor.fetchone()[0]
+            fire_count = total_count(conn)
+            status_data['data_version'] = data_version(conn)
             conn.close()
             status_data['fire_events_count'] = fire_count
         except:
@@ -448,22 +1527,343 @@ def health_check():
 if fire_config:
     @app.route('/tiles/<int:z>/<int:x>/<int:y>.png')
     def serve_tile(z, x, y):
-        """Serve map tiles from local storage."""
+        """
+        Serve map tiles from the MBTiles file (or the tile directory fallback).
+        
+        Tiles come through an in-memory LRU (preloaded at startup) with strong
+        ETags and immutable caching headers; misses are remembered for
+        TILE_NEGATIVE_TTL seconds so repeated 404s skip the store.
+        
+        Tiles that are not stored are synthesized from the nearest ancestor
+        (overzoom) or from their descendants (underzoom) and kept in the
+        derived tile cache.
+        """
+        if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return '', 404
+        # Tiles are immutable, so validators only change when the store is rewritten
+        modified = base_tile_store.modified_time()
+        key = base_tile_key(z, x, y, modified)
         try:
-            tile_dir = os.path.join(os.path.dirname(__file__), 
-                                  fire_config.TILE_DIRECTORY, str(z), str(x))
-            filename = f'{y}.png'
-            
-            if os.path.exists(os.path.join(tile_dir, filename)):
-                return send_from_directory(tile_dir, filename)
-            else:
-                logger.warning(f"Tile not found: {z}/{x}/{y}")
-                return '', 404
-                
+            response = serve_cached_tile(base_tile_cache, key, lambda: base_tile_store.get_tile(z, x, y),
+                                         'image/png', fire_config.IMMUTABLE_MAX_AGE, modified)
+            if response.status_code == 404 and derived_tile_cache is not None:
+                response = serve_cached_tile(
+                    derived_tile_cache, key,
+                    lambda: synthesize_tile(lambda *tile: read_base_tile(*tile, modified), z, x, y,
+                                            fire_config.TILE_OVERZOOM_LEVELS, fire_config.TILE_UNDERZOOM_LEVELS),
+                    'image/png', fire_config.IMMUTABLE_MAX_AGE, modified)
+            return response
         except Exception as e:
             logger.error(f"Error serving tile {z}/{x}/{y}: {e}")
             return '', 500
 
+    def base_tile_key(z: int, x: int, y: int, modified: float) -> str:
+        """Cache key (and ETag source) of a base map tile at store version modified."""
+        return f"tiles/{z}/{x}/{y}|{modified}"
+
+    def read_base_tile(z: int, x: int, y: int, modified: float) -> Optional[bytes]:
+        """Stored tile bytes through the base tile cache, None if the store lacks the tile."""
+        key = base_tile_key(z, x, y, modified)
+        data = base_tile_cache.get(key)
+        if data is None and not base_tile_cache.is_missing(key):
+            data = base_tile_store.get_tile(z, x, y)
+            if data is None:
+                base_tile_cache.put_missing(key)
+            else:
+                base_tile_cache.store(key, data)
+        return data
+
+    def get_data_version() -> str:
+        """Rollup load generation and high-water event id; changes whenever events are loaded."""
+        conn = sqlite3.connect(db_path)
+        version = data_version(conn)
+        conn.close()
+        return version
+
+    def serve_cached_tile(cache, key: str, render, mimetype: str, max_age: int,
+                          last_modified: Optional[float] = None) -> Response:
+        """
+        Answer a tile request from cache, calling render() for the bytes on a miss.
+        
+        The ETag is derived from the cache key, so a matching If-None-Match is
+        answered with 304 before the cache is read or anything is rendered.
+        render() returning None means there is no tile: the key is cached as a
+        negative entry and answered with 404.
+        """
+        etag = TileCache.make_etag(key)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            data = cache.get(key)
+            if data is None:
+                if cache.is_missing(key):
+                    return Response(status=404)
+                data = render()
+                if data is None:
+                    logger.debug(f"Tile not found: {key}")
+                    cache.put_missing(key)
+                    return Response(status=404)
+                cache.put(key, data)
+            response = Response(data, mimetype=mimetype)
+        
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = datetime.fromtimestamp(int(last_modified), timezone.utc)
+        if max_age >= fire_config.IMMUTABLE_MAX_AGE:
+            response.headers['Cache-Control'] = f'public, max-age={max_age}, immutable'
+        else:
+            response.headers['Cache-Control'] = f'public, max-age={max_age}'
+        return response
+
+    @app.route('/heat/<int:z>/<int:x>/<int:y>.png')
+    def serve_heat_tile(z, x, y):
+        """
+        Serve a fire density heatmap tile on the same XYZ scheme as /tiles.
+        
+        Takes the /api/fires time and attribute filters plus weight=count|frp.
+        Tiles are cached per (z, x, y, normalized filters, data version) and carry an
+        ETag, so unchanged tiles are answered with 304 without rendering.
+        """
+        if heat_tile_cache is None:
+            return jsonify({'error': 'Heatmap tiles require NumPy'}), 503
+        if not 0 <= z <= fire_config.HEATMAP_MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return '', 404
+        weight = request.args.get('weight', 'count')
+        if weight not in fire_config.HEATMAP_SATURATION:
+            return jsonify({'error': f'Invalid weight: {weight}'}), 400
+        
+        try:
+            filters = normalize_dates({name: request.args[name] for name in HEAT_FILTERS if request.args.get(name)})
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        version = get_data_version()
+        heat_tile_cache.set_version(version)
+        key = '|'.join([f"heat/{z}/{x}/{y}", version, weight] +
+                       [f"{name}={value}" for name, value in sorted(filters.items())])
+        
+        def render() -> bytes:
+            radius = fire_config.HEATMAP_RADIUS
+            south, north, west, east = tile_bounds(z, x, y, radius)
+            sql, params = build_scan_query(dict(filters, bbox=f"{west},{south},{east},{north}"),
+                                           ['latitude', 'longitude', 'frp'])
+            grid = heat_grid(radius)
+            for rows in iter_chunks(db_path, sql, params, fire_config.HEATMAP_CHUNK):
+                points = np.array(rows, dtype=float)
+                weights = np.nan_to_num(points[:, 2]) if weight == 'frp' else np.ones(len(points))
+                bin_points(grid, points[:, 0], points[:, 1], weights, z, x, y, radius)
+            return encode_png(shade_heatmap(grid, radius, fire_config.HEATMAP_SATURATION[weight]))
+        
+        try:
+            return serve_cached_tile(heat_tile_cache, key, render, 'image/png', fire_config.HEATMAP_MAX_AGE)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    @app.route('/fires/<int:z>/<int:x>/<int:y>')
+    def serve_fire_tile(z, x, y):
+        """
+        Serve the fires inside one XYZ tile for a time window as GeoJSON or binary.
+        
+        Takes the /api/fires time and attribute filters, fields and format.
+        Below AGGREGATE_BELOW_ZOOM, or past FIRE_TILE_MAX_POINTS, the tile
+        holds grid clusters instead of points, built from the columnar event
+        index when it is loaded at the current data version (otherwise from at
+        most FIRE_TILE_MAX_CLUSTERED rows, with 'truncated' set past that). A fixed window (start_date
+        and end_date) requested with the current data version (version=, as
+        reported by /api/status) is immutable and cached as such by browsers.
+        """
+        if fire_tile_cache is None:
+            return jsonify({'error': 'Fire tiles require NumPy'}), 503
+        if not 0 <= z <= fire_config.FIRE_TILE_MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return '', 404
+        args = request.args
+        tile_format = args.get('format', 'geojson')
+        if tile_format not in FIRE_TILE_FORMATS:
+            return jsonify({'error': f'Invalid format: {tile_format}'}), 400
+        
+        try:
+            requested = args['fields'].split(',') if args.get('fields') else fire_config.PLAYBACK_DEFAULT_FIELDS
+            fields = fire_config.get_playback_fields(list(requested) + ['latitude', 'longitude'])
+            filters = normalize_dates({name: args[name] for name in HEAT_FILTERS if args.get(name)})
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        version = get_data_version()
+        fire_tile_cache.set_version(version)
+        key = '|'.join([f"fires/{z}/{x}/{y}", version, tile_format, ','.join(fields)] +
+                       [f"{name}={value}" for name, value in sorted(filters.items())])
+        fixed = bool(filters.get('start_date') and filters.get('end_date'))
+        immutable = fixed and args.get('version') == version
+        
+        def read_rows(row_fields: List[str], limit: int) -> List[Dict[str, Any]]:
+            south, north, west, east = tile_bounds(z, x, y)
+            sql, params = build_query(dict(filters, bbox=f"{west},{south},{east},{north}"), row_fields, limit)
+            return [row for rows in iter_rows(db_path, sql, params, row_fields, fire_config.FIRES_STREAM_CHUNK)
+                    for row in rows]
+        
+        def render() -> bytes:
+            window = [filters.get('start_date'), filters.get('end_date')]
+            aggregate = z < fire_config.AGGREGATE_BELOW_ZOOM
+            if not aggregate:
+                rows = read_rows(fields, fire_config.FIRE_TILE_MAX_POINTS + 1)
+                aggregate = len(rows) > fire_config.FIRE_TILE_MAX_POINTS
+            if not aggregate:
+                tile = build_tile(z, x, y, window, rows, False, fire_config.AGGREGATE_GRID_SIZE)
+            elif event_index and event_index.ensure_loaded() and event_index.version == version:
+                # Clusters straight from the columnar index: every event counted, no row dicts.
+                # The index is loaded once, so after new events it no longer matches version.
+                count, clusters = event_index.tile_clusters(
+                    z, x, y, fire_config.AGGREGATE_GRID_SIZE,
+                    parse_timestamp(window[0]) if window[0] else None,
+                    parse_timestamp(window[1]) if window[1] else None,
+                    {name: filters[name].split(',') for name in LIST_FILTERS if name in filters},
+                    float(filters['min_frp']) if 'min_frp' in filters else None)
+                tile = make_tile(z, x, y, window, count, [], clusters, True)
+            else:
+                limit = fire_config.FIRE_TILE_MAX_CLUSTERED
+                rows = read_rows(['id', 'datetime_utc', 'latitude', 'longitude', 'frp', 'confidence'], limit + 1)
+                tile = build_tile(z, x, y, window, rows[:limit], True, fire_config.AGGREGATE_GRID_SIZE,
+                                  truncated=len(rows) > limit)
+            return encode_tile(tile, tile_format)
+        
+        max_age = fire_config.IMMUTABLE_MAX_AGE if immutable else fire_config.FIRE_TILE_MAX_AGE
+        try:
+            return serve_cached_tile(fire_tile_cache, key, render, FIRE_TILE_FORMATS[tile_format], max_age)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    @app.route('/api/playback/seek', methods=['POST'])
+    def seek_playback():
+        """Seek a running playback (by Socket.IO sid or room) to a timestamp."""
+        data = request.get_json() or {}
+        timestamp = data.get('timestamp')
+        
+        if not playback_manager:
+            return jsonify({'error': 'Fire tracking not available'}), 503
+        if not timestamp:
+            return jsonify({'error': 'timestamp is required'}), 400
+        
+        if data.get('room'):
+            session = playback_manager.get_room_session(data['room'])
+        else:
+            session = playback_manager.get_session(data.get('sid', ''))
+        if not session:
+            return jsonify({'error': 'No active playback for that sid or room'}), 404
+        
+        try:
+            return jsonify(playback_manager.seek_session(session, timestamp))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    @app.route('/api/fires', methods=['GET'])
+    def query_fires():
+        """
+        Stream fire events matching the filters as NDJSON, CSV or binary.
+        
+        Filters: start_date, end_date, bbox (west,south,east,north), confidence,
+        satellite, instrument, daynight (comma-separated), min_frp. Pages of
+        `limit` rows continue from the `after` cursor.
+        """
+        args = request.args
+        response_format = args.get('format', 'ndjson')
+        if response_format not in FIRES_FORMATS:
+            return jsonify({'error': f'Invalid format: {response_format}'}), 400
+        
+        try:
+            fields = fire_config.get_playback_fields(
+                args['fields'].split(',') if args.get('fields') else fire_config.PLAYBACK_FIELDS)
+            limit = int(args.get('limit', fire_config.FIRES_DEFAULT_LIMIT))
+            if not 0 < limit <= fire_config.FIRES_MAX_LIMIT:
+                raise ValueError(f'limit must be between 1 and {fire_config.FIRES_MAX_LIMIT}')
+            sql, params = build_query(args, fields, limit)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return Response(stream_fires(db_path, sql, params, fields, limit, response_format,
+                                     fire_config.FIRES_STREAM_CHUNK),
+                        mimetype=FIRES_FORMATS[response_format])
+
+    @app.route('/api/fires/rollup', methods=['GET'])
+    def query_fire_rollup():
+        """
+        Fire counts from the precomputed rollups for timelines and dashboards.
+        
+        bucket is hour, day or total; group_by is a comma-separated subset of
+        confidence, instrument and cell. count is the exact total for the range.
+        """
+        args = request.args
+        bucket = args.get('bucket', 'day')
+        if bucket not in ('hour', 'day', 'total'):
+            return jsonify({'error': f'Invalid bucket: {bucket}'}), 400
+        
+        try:
+            group_by = args['group_by'].split(',') if args.get('group_by') else []
+            start_dt = parse_timestamp(args['start_date']) if args.get('start_date') else None
+            end_dt = parse_timestamp(args['end_date']) if args.get('end_date') else None
+            conn = sqlite3.connect(db_path)
+            try:
+                rows = query_rollup(conn, None if bucket == 'total' else bucket, group_by, start_dt, end_dt)
+                count = count_range(conn, start_dt, end_dt)
+            finally:
+                conn.close()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'bucket': bucket,
+            'group_by': group_by,
+            'cell_degrees': ROLLUP_CELL_DEGREES,
+            'count': count,
+            'rows': rows
+        })
+
+    @app.route('/api/playback/stream', methods=['GET'])
+    def stream_playback():
+        """
+        Stream an unpaced replay of a date range as fire_update frames.
+        
+        Frames are built exactly as for Socket.IO playback but produced only as
+        fast as the client reads the response, so the stream doubles as a
+        throughput benchmark (the closing playback_ended record has the rates).
+        """
+        args = request.args
+        stream_format = args.get('format', 'ndjson')
+        if stream_format not in STREAM_FORMATS:
+            return jsonify({'error': f'Invalid format: {stream_format}'}), 400
+        
+        try:
+            producer = FireDataProducer(db_path, event_index)
+            producer.set_date_range(args['start_date'], args['end_date'])
+            producer.set_speed(args.get('speed', fire_config.DEFAULT_SPEED))
+            producer.set_fields(args['fields'].split(',') if args.get('fields') else None)
+            producer.unpaced = True
+            if not producer.prepare():
+                return jsonify({'error': 'Date range not set or config missing'}), 400
+        except KeyError as e:
+            return jsonify({'error': f'{e.args[0]} is required'}), 400
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        session = PlaybackSession(f"stream:{uuid.uuid4().hex}", producer)
+        
+        def generate():
+            started = time.perf_counter()
+            frames = 0
+            for emit_data in session.replay():
+                frames += 1
+                yield encode_stream_record('fire_update', emit_data, stream_format)
+            
+            elapsed = time.perf_counter() - started
+            logger.info(f"Streamed {frames} frames ({producer.processed_records} records) in {elapsed:.2f}s")
+            yield encode_stream_record('playback_ended', {
+                'frames': frames,
+                'records': producer.processed_records,
+                'elapsed_seconds': round(elapsed, 3),
+                'records_per_second': round(producer.processed_records / elapsed) if elapsed else None,
+                'statistics': dict(session.fire_statistics)
+            }, stream_format)
+        
+        return Response(generate(), mimetype=STREAM_FORMATS[stream_format])
+
 
 # ========== WEBSOCKET EVENT HANDLERS ==========
 
@@ -484,7 +1884,9 @@ if socketio:
                 'playback_speeds': fire_config.PLAYBACK_SPEEDS,
                 'speed_labels': fire_config.SPEED_LABELS,
                 'default_speed': fire_config.DEFAULT_SPEED,
-                'default_date_range': fire_config.DEFAULT_DATE_RANGE
+                'default_date_range': fire_config.DEFAULT_DATE_RANGE,
+                'encodings': list(ENCODINGS),
+                'binary_frame_layout': get_frame_layout()
             }
             logger.info(f"Emitting config to client {request.sid}: {config_data}")
             emit('config', config_data)
@@ -493,11 +1895,13 @@ if socketio:
     def handle_disconnect():
         """Handle client disconnection."""
         logger.info(f"Client disconnected: {request.sid}")
+        if playback_manager:
+            playback_manager.forget_client(request.sid)
 
     @socketio.on('start_playback')
     def handle_start_playback(data):
-        """Handle playback start request."""
-        if not fire_config or not producer or not consumer:
+        """Handle playback start request (optionally joining a shared room)."""
+        if not fire_config or not playback_manager:
             emit('playback_error', {'error': 'Fire tracking not available'})
             return
             
@@ -505,35 +1909,64 @@ if socketio:
             start_date = data.get('start_date')
             end_date = data.get('end_date')
             speed = data.get('speed', fire_config.DEFAULT_SPEED)
+            room = data.get('room')
+            encoding = data.get('encoding', DEFAULT_ENCODING)
+            fields = data.get('fields')
+            clusters = bool(data.get('clusters', False))
+            unpaced = bool(data.get('unpaced', False))
             
-            logger.info(f"Starting playback: {start_date} to {end_date} at {speed}")
-            
-            producer.set_date_range(start_date, end_date)
-            producer.set_speed(speed)
-            producer.is_paused = False
+            logger.info(f"Starting playback for {request.sid}: {start_date} to {end_date} at {speed}"
+                        + (f" in room {room}" if room else ""))
             
-            consumer.start()
-            producer.start()
+            session, joined = playback_manager.start_session(request.sid, start_date, end_date, speed,
+                                                            room, encoding, fields, clusters, unpaced)
+            producer = session.producer
             
             emit('playback_started', {
                 'status': 'success',
-                'start_date': start_date,
-                'end_date': end_date,
-                'speed': speed
+                'start_date': producer.start_date.isoformat(),
+                'end_date': producer.end_date.isoformat(),
+                'speed': producer.current_speed,
+                'room': room,
+                'joined': joined,
+                'encoding': encoding,
+                'fields': producer.fields,
+                'clusters': producer.aggregate,
+                'unpaced': producer.unpaced,
+                'session_id': session.session_id
             })
             
+            if joined:
+                playback_manager.send_snapshot(session, request.sid)
+            
         except Exception as e:
             logger.error(f"Error starting playback: {e}")
             emit('playback_error', {'error': str(e)})
 
+    @socketio.on('resume_playback_from')
+    def handle_resume_playback_from(data):
+        """Handle reconnect - reattach to data['session_id'] and replay frames after data['seq']."""
+        if not fire_config or not playback_manager:
+            emit('playback_error', {'error': 'Fire tracking not available'})
+            return
+            
+        try:
+            playback_manager.resume_from(request.sid, data.get('session_id'),
+                                         int(data.get('seq', 0)), data.get('encoding'))
+            
+        except Exception as e:
+            logger.error(f"Error resuming playback: {e}")
+            emit('playback_error', {'error': str(e)})
+
     @socketio.on('pause_playback')
     def handle_pause_playback():
         """Handle playback pause request."""
-        if producer:
+        if playback_manager:
             try:
-                producer.pause()
-                emit('playback_paused')
-                logger.info("Playback paused")
+                session = playback_manager.pause_session(request.sid)
+                if session:
+                    emit('playback_paused', to=session.target)
+                    logger.info(f"Playback paused for {session.target}")
             except Exception as e:
                 logger.error(f"Error pausing playback: {e}")
                 emit('playback_error', {'error': str(e)})
@@ -541,43 +1974,78 @@ if socketio:
     @socketio.on('resume_playback')
     def handle_resume_playback():
         """Handle playback resume request."""
-        if producer:
+        if playback_manager:
             try:
-                producer.resume()
-                emit('playback_resumed')
-                logger.info("Playback resumed")
+                session = playback_manager.resume_session(request.sid)
+                if session:
+                    emit('playback_resumed', to=session.target)
+                    logger.info(f"Playback resumed for {session.target}")
             except Exception as e:
                 logger.error(f"Error resuming playback: {e}")
                 emit('playback_error', {'error': str(e)})
 
     @socketio.on('stop_playback')
     def handle_stop_playback():
-        """Handle playback stop request."""
+        """Handle playback stop request (leaves the room for shared playback)."""
         try:
-            if producer:
-                producer.stop()
-            if consumer:
-                consumer.stop()
-            
-            # Clear queue
-            if data_queue:
-                while not data_queue.empty():
-                    try:
-                        data_queue.get_nowait()
-                    except:
-                        break
+            if playback_manager:
+                playback_manager.stop_session(request.sid)
             
             emit('playback_stopped')
-            logger.info("Playback stopped")
+            logger.info(f"Playback stopped for {request.sid}")
             
         except Exception as e:
             logger.error(f"Error stopping playback: {e}")
             emit('playback_error', {'error': str(e)})
 
+    @socketio.on('seek_playback')
+    def handle_seek_playback(data):
+        """Handle seek request - move the session cursor to data['timestamp']."""
+        if not fire_config or not playback_manager:
+            emit('playback_error', {'error': 'Fire tracking not available'})
+            return
+            
+        try:
+            session = playback_manager.get_session(request.sid)
+            if not session:
+                emit('playback_error', {'error': 'No active playback to seek'})
+                return
+            
+            seek_data = playback_manager.seek_session(session, data.get('timestamp'))
+            logger.info(f"Playback seeked to {seek_data['timestamp']} for {session.target}")
+            
+        except ValueError as e:
+            logger.warning(f"Invalid seek timestamp from {request.sid}: {e}")
+            emit('playback_error', {'error': str(e)})
+        except Exception as e:
+            logger.error(f"Error seeking playback: {e}")
+            emit('playback_error', {'error': str(e)})
+
+    @socketio.on('set_viewport')
+    def handle_set_viewport(data):
+        """Handle map viewport update (bounds and zoom) for server-side culling."""
+        if not fire_config or not playback_manager:
+            emit('playback_error', {'error': 'Fire tracking not available'})
+            return
+            
+        try:
+            viewport = fire_config.get_viewport_bounds(data)
+            session = playback_manager.set_viewport(request.sid, viewport)
+            emit('viewport_set', {
+                'viewport': viewport,
+                'applied': not (session and session.room)
+            })
+            
+        except (KeyError, TypeError, ValueError) as e:
+            emit('playback_error', {'error': f'Invalid viewport: {e}'})
+        except Exception as e:
+            logger.error(f"Error setting viewport: {e}")
+            emit('playback_error', {'error': str(e)})
+
     @socketio.on('change_speed')
     def handle_change_speed(data):
         """Handle speed change request."""
-        if not fire_config or not producer:
+        if not fire_config or not playback_manager:
             emit('playback_error', {'error': 'Fire tracking not available'})
             return
             
@@ -585,9 +2053,9 @@ if socketio:
             new_speed = data.get('speed')
             
             if new_speed in fire_config.PLAYBACK_SPEEDS:
-                producer.set_speed(new_speed)
-                emit('speed_changed', {'speed': new_speed})
-                logger.info(f"Speed changed to {new_speed}")
+                session = playback_manager.set_speed(request.sid, new_speed)
+                emit('speed_changed', {'speed': new_speed}, to=session.target if session else request.sid)
+                logger.info(f"Speed changed to {new_speed} for {request.sid}")
             else:
                 emit('playback_error', {'error': f'Invalid speed: {new_speed}'})
                 
@@ -607,10 +2075,16 @@ def check_fire_tracking_setup():
         return False
     
     try:
+        # Databases built before the R*Tree and rollups existed get them on first start
+        indexed = ensure_spatial_index(db_path)
+        if indexed:
+            logger.info(f"Spatial index updated with {indexed} events")
+        rolled_up = ensure_rollups(db_path)
+        if rolled_up:
+            logger.info(f"Rollups updated with {rolled_up} events")
+        
         conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM fire_events")
-        count = cursor.fetchone()[0]
+        count = total_count(conn)
         conn.close()
         logger.info(f"Fire tracking database loaded with {count} events")
         return True
@@ -619,6 +2093,22 @@ def check_fire_tracking_setup():
         return False
 
 
+def preload_base_tiles():
+    """Load the base map tiles of config.TILE_PRELOAD_ZOOMS into the tile cache."""
+    if not base_tile_cache:
+        return
+    loaded = 0
+    modified = base_tile_store.modified_time()
+    for zoom in fire_config.TILE_PRELOAD_ZOOMS:
+        for z, x, y in base_tile_store.iter_tiles(zoom):
+            data = base_tile_store.get_tile(z, x, y)
+            if data:
+                base_tile_cache.store(base_tile_key(z, x, y, modified), data)
+                loaded += 1
+    stats = base_tile_cache.get_stats()
+    logger.info(f"Preloaded {loaded} map tiles ({stats['entries']} cached, {stats['bytes'] / 1e6:.1f} MB)")
+
+
 def main():
     """Main entry point."""
     logger.info("Starting U_Drone Flask Application")
@@ -627,6 +2117,9 @@ def main():
     fire_available = check_fire_tracking_setup()
     if fire_available:
         logger.info("Fire tracking system enabled")
+        if event_index:
+            event_index.load()
+        preload_base_tiles()
     else:
         logger.info("Fire tracking system disabled - running in basic mode")
     
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark bbox and bbox+time queries on fire_events: the B-tree indexes
+(idx_location, idx_datetime_location) against the R*Tree in spatial_index.py.
+
+Usage:
+    python benchmark_spatial_index.py [db_path]        # existing database
+    python benchmark_spatial_index.py --synthetic N    # N random events in a temp database
+"""
+
+import os
+import sys
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import config as fire_config
+from spatial_index import bbox_condition, ensure_spatial_index
+
+BOX_SIZES = [0.5, 2.0, 5.0]  # Box edge in degrees
+TIME_WINDOWS = [None, 1, 7]  # Days (None = no time filter)
+QUERIES_PER_CASE = 50
+
+
+def create_synthetic_db(db_path: str, count: int):
+    """Fill a database with count events spread over the bounding box and 22 months."""
+    box = fire_config.BOUNDING_BOX
+    start = datetime(2023, 1, 1)
+    span = int(timedelta(days=670).total_seconds())
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE fire_events (
+            id INTEGER PRIMARY KEY, datetime_utc DATETIME NOT NULL,
+            latitude REAL NOT NULL, longitude REAL NOT NULL, frp REAL DEFAULT 0.0
+        )
+    """)
+    rows = sorted(
+        ((start + timedelta(seconds=random.randrange(span))).strftime('%Y-%m-%d %H:%M:%S'),
+         random.uniform(box['south'], box['north']), random.uniform(box['west'], box['east']),
+         random.uniform(0, 50))
+        for _ in range(count)
+    )
+    conn.executemany("INSERT INTO fire_events (datetime_utc, latitude, longitude, frp) VALUES (?, ?, ?, ?)", rows)
+    conn.execute("CREATE INDEX idx_datetime ON fire_events(datetime_utc)")
+    conn.execute("CREATE INDEX idx_location ON fire_events(latitude, longitude)")
+    conn.execute("CREATE INDEX idx_datetime_location ON fire_events(datetime_utc, latitude, longitude)")
+    conn.commit()
+    conn.close()
+
+
+def random_case(conn: sqlite3.Connection, size: float, days):
+    """A random box of the given size and, if days is set, a time window inside the data range."""
+    box = fire_config.BOUNDING_BOX
+    south = random.uniform(box['south'], box['north'] - size)
+    west = random.uniform(box['west'], box['east'] - size)
+    if days is None:
+        return (south, south + size, west, west + size), None, None
+
+    first, last = conn.execute("SELECT MIN(datetime_utc), MAX(datetime_utc) FROM fire_events").fetchone()
+    first, last = datetime.fromisoformat(first), datetime.fromisoformat(last)
+    span = max(0, int((last - first).total_seconds()) - days * 86400)
+    start_dt = first + timedelta(seconds=random.randrange(span + 1))
+    return (south, south + size, west, west + size), start_dt, start_dt + timedelta(days=days)
+
+
+def btree_query(bounds, start_dt, end_dt):
+    """The query the B-tree indexes serve (pre-R*Tree SQL)."""
+    south, north, west, east = bounds
+    sql = ("SELECT id, datetime_utc, latitude, longitude, frp FROM fire_events "
+           "WHERE latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?")
+    params = [south, north, west, east]
+    if start_dt:
+        sql += " AND datetime_utc BETWEEN ? AND ?"
+        params += [start_dt.strftime('%Y-%m-%d %H:%M:%S'), end_dt.strftime('%Y-%m-%d %H:%M:%S')]
+    return sql, params
+
+
+def rtree_query(bounds, start_dt, end_dt):
+    """The same query pruned on the R*Tree, with the exact predicates kept."""
+    sql, params = btree_query(bounds, start_dt, end_dt)
+    spatial_filter, spatial_params = bbox_condition(*bounds, start_dt, end_dt)
+    return f"{sql} AND {spatial_filter}", params + spatial_params
+
+
+def time_queries(conn: sqlite3.Connection, queries) -> tuple:
+    """Run queries and fetch their rows; returns (ms per query, row counts)."""
+    started = time.perf_counter()
+    counts = [len(conn.execute(sql, params).fetchall()) for sql, params in queries]
+    return (time.perf_counter() - started) * 1000 / len(queries), counts
+
+
+def run_benchmark(db_path: str):
+    """Print ms/query for each box size and time window, B-tree vs R*Tree."""
+    indexed = ensure_spatial_index(db_path)
+    conn = sqlite3.connect(db_path)
+    total = conn.execute("SELECT COUNT(*) FROM fire_events").fetchone()[0]
+    print(f"Database: {db_path} ({total} events, {indexed} newly indexed)")
+    print(f"{'box':>6} {'window':>8} {'rows/query':>11} {'B-tree ms':>10} {'R*Tree ms':>10} {'speedup':>8}")
+
+    random.seed(42)
+    for size in BOX_SIZES:
+        for days in TIME_WINDOWS:
+            cases = [random_case(conn, size, days) for _ in range(QUERIES_PER_CASE)]
+            btree_ms, btree_counts = time_queries(conn, [btree_query(*case) for case in cases])
+            rtree_ms, rtree_counts = time_queries(conn, [rtree_query(*case) for case in cases])
+            if btree_counts != rtree_counts:
+                raise AssertionError(f"Result mismatch for {size} deg / {days} days")
+
+            window = f"{days}d" if days else "-"
+            print(f"{size:>5}° {window:>8} {sum(btree_counts) / len(cases):>11.1f} "
+                  f"{btree_ms:>10.2f} {rtree_ms:>10.2f} {btree_ms / rtree_ms:>7.1f}x")
+    conn.close()
+
+
+def main():
+    """Main entry point."""
+    if len(sys.argv) > 2 and sys.argv[1] == '--synthetic':
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'fire_benchmark.db')
+            print(f"Generating {sys.argv[2]} synthetic events...")
+            create_synthetic_db(db_path, int(sys.argv[2]))
+            run_benchmark(db_path)
+    else:
+        run_benchmark(sys.argv[1] if len(sys.argv) > 1 else fire_config.DATABASE_PATH)
+
+
+if __name__ == "__main__":
+    main()
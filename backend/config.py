@@ -36,6 +36,28 @@ PLAYBACK_SPEEDS = {
 
 DEFAULT_SPEED = 'slow'  # Default playback speed (1 day/sec)
 
+# Shared playback rooms (opt-in via 'room' in start_playback)
+# One producer serves every member; late joiners get the last few ticks as a snapshot
+PLAYBACK_ROOM_PREFIX = 'playback:'  # Socket.IO room name prefix
+PLAYBACK_ROOM_SNAPSHOT_SECONDS = 4.0  # Seconds of updates replayed to late joiners (covers visible + fade time)
+
+# Backpressure: the scheduler never blocks on a slow client
+# Frames buffered per session past the high-water mark are merged into one catch-up frame
+PLAYBACK_OUTBOUND_HIGH_WATER = 20  # Frames buffered per session before coalescing
+PLAYBACK_CLIENT_HIGH_WATER = 32  # Engine.IO packets pending before a client counts as behind
+PLAYBACK_CLIENT_LOW_WATER = 4  # Pending packets at which a lagging room member is caught up
+PLAYBACK_UNPACED_BUFFER = 16  # Frames buffered per unpaced session before it waits for the consumer
+
+# Bulk query API (/api/fires): keyset-paginated, streamed in chunks
+FIRES_DEFAULT_LIMIT = 10000  # Rows per page when no limit is given
+FIRES_MAX_LIMIT = 500000  # Largest page (covers the whole dataset in one stream)
+FIRES_STREAM_CHUNK = 2000  # Rows fetched and encoded per chunk
+
+# Reconnect recovery: numbered delta frames with periodic keyframes of the active set
+PLAYBACK_KEYFRAME_INTERVAL = 50  # Frames between keyframes
+PLAYBACK_HISTORY_FRAMES = 300  # Frames retained per session for resume_playback_from replay
+PLAYBACK_RESUME_GRACE_SECONDS = 30  # How long a private session waits for its client to reconnect
+
 # Calculate speed multipliers for UI
 SPEED_LABELS = {
     'slowest': '6 hrs/sec',
@@ -48,6 +70,49 @@ SPEED_LABELS = {
 # Database Configuration
 DATABASE_PATH = 'fire_data.db'
 
+# Load fire_events into in-memory column arrays for playback (requires NumPy).
+# Falls back to per-interval SQLite queries when disabled or unavailable.
+USE_COLUMNAR_INDEX = True
+
+# Viewport culling (set_viewport): fraction of the viewport added on each side
+VIEWPORT_PADDING = 0.1
+
+def get_viewport_bounds(viewport):
+    """Validate a client viewport and pad it by VIEWPORT_PADDING on each side."""
+    north, south = float(viewport['north']), float(viewport['south'])
+    east, west = float(viewport['east']), float(viewport['west'])
+    if south > north or west > east:
+        raise ValueError('Viewport must have south <= north and west <= east')
+    
+    pad_lat = (north - south) * VIEWPORT_PADDING
+    pad_lon = (east - west) * VIEWPORT_PADDING
+    return {
+        'north': north + pad_lat,
+        'south': south - pad_lat,
+        'east': east + pad_lon,
+        'west': west - pad_lon,
+        'zoom': int(viewport.get('zoom', DEFAULT_ZOOM))
+    }
+
+# Playback record fields
+# Clients may pass 'fields' in start_playback; id and datetime_utc are always sent
+PLAYBACK_FIELDS = [
+    'id', 'datetime_utc', 'latitude', 'longitude', 'brightness', 'bright_t31',
+    'frp', 'confidence', 'scan', 'track', 'satellite', 'instrument',
+    'daynight', 'type', 'version'
+]
+PLAYBACK_REQUIRED_FIELDS = ['id', 'datetime_utc']
+PLAYBACK_DEFAULT_FIELDS = ['latitude', 'longitude', 'confidence', 'frp']  # What the map renders
+
+def get_playback_fields(fields=None):
+    """Validate a requested field list; returns it in PLAYBACK_FIELDS order."""
+    requested = set(PLAYBACK_DEFAULT_FIELDS if fields is None else fields)
+    unknown = requested - set(PLAYBACK_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown playback fields: {', '.join(sorted(unknown))}")
+    requested.update(PLAYBACK_REQUIRED_FIELDS)
+    return [field for field in PLAYBACK_FIELDS if field in requested]
+
 # Date Range Configuration
 def get_default_date_range():
     """Get default date range (last 2 years from today)."""
@@ -76,6 +141,16 @@ def get_queue_size(speed_key):
     else:  # Fastest speed
         return 2000
 
+# Playback tick rate
+def get_tick_interval():
+    """Seconds of wall time per playback tick (UI_UPDATE_INTERVAL, at most 1 second)."""
+    return min(1.0, UI_UPDATE_INTERVAL / 1000.0)
+
+# Read-ahead depth for playback
+def get_prefetch_depth(speed_key):
+    """Number of playback ticks queried ahead of the clock (scaled from the queue size)."""
+    return max(2, get_queue_size(speed_key) // 50)
+
 # Batch sizes for database queries
 def get_batch_size(speed_key):
     """Calculate batch size for database queries based on speed."""
@@ -86,12 +161,24 @@ def get_batch_size(speed_key):
     days_per_second = speed_hours / 24
     events_per_second = days_per_second * 150  # Average 150 fires/day
     
-    # Batch every 0.1 seconds for smooth playback
-    batch_size = int(events_per_second * 0.1)
+    # One batch per playback tick (UI_UPDATE_INTERVAL) for smooth playback
+    batch_size = int(events_per_second * get_tick_interval())
     
     # Minimum batch size of 10, maximum of 1000
     return max(10, min(1000, batch_size))
 
+# Server-side aggregation for clients that send clusters=True in start_playback
+AGGREGATE_BELOW_ZOOM = 7  # Viewport zooms below this always get clusters
+AGGREGATE_GRID_SIZE = 8  # Cells per tile side (8 -> 32px cells on 256px tiles)
+
+def get_aggregate_threshold(speed_key):
+    """
+    Points per tick above which a frame is aggregated.
+    Spreads MAX_CONCURRENT_MARKERS over the ticks a marker stays visible (2 x fade).
+    """
+    visible_ticks = max(1.0, 2 * get_fade_duration(speed_key) / get_tick_interval())
+    return int(MAX_CONCURRENT_MARKERS / visible_ticks)
+
 # Marker Animation Configuration
 MARKER_FADE_TYPE = 'exponential'  # Type of fade animation
 
@@ -121,6 +208,37 @@ FADE_EXPONENT = 2.0  # Controls how quickly opacity decreases (higher = faster a
 TILE_SERVER_PORT = 5001
 TILE_DIRECTORY = 'map_tiles'
 TILE_URL_PATTERN = '/tiles/{z}/{x}/{y}.png'
+TILE_STORE_FORMAT = 'mbtiles'  # What download_tiles.py writes: 'mbtiles' or 'directory' ({z}/{x}/{y}.png)
+TILE_MBTILES_PATH = os.path.join(TILE_DIRECTORY, 'tiles.mbtiles')  # Served instead of the directory when present
+TILE_MMAP_SIZE = 256 * 1024 * 1024  # Bytes of the MBTiles file SQLite reads through mmap
+TILE_CACHE_SIZE = 4096  # Base map tiles kept in memory
+TILE_CACHE_MAX_BYTES = 128 * 1024 * 1024  # Memory bound of the base map tile cache
+TILE_PRELOAD_ZOOMS = [6, 7, 8]  # Zoom levels loaded into the tile cache at startup
+TILE_NEGATIVE_TTL = 300  # Seconds a missing tile is remembered (tiles downloaded later appear after this)
+TILE_OVERZOOM_LEVELS = 6  # Zooms below a stored ancestor a missing tile is upscaled from (8 -> 14)
+TILE_UNDERZOOM_LEVELS = 2  # Zooms above stored descendants a missing tile is mosaicked from (6 -> 4)
+TILE_DERIVED_CACHE_SIZE = 2048  # Synthesized tiles kept in memory
+TILE_DERIVED_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Memory bound of the synthesized tile cache
+
+# Heatmap Tiles (/heat/{z}/{x}/{y}.png)
+HEATMAP_MAX_ZOOM = 12  # Deepest zoom rendered
+HEATMAP_RADIUS = 6  # Blur radius in pixels (also the margin read around each tile)
+HEATMAP_SATURATION = {'count': 8.0, 'frp': 200.0}  # Blurred weight per pixel at the top of the color ramp
+HEATMAP_CHUNK = 50000  # Events fetched and binned at a time (every matching event is drawn)
+HEATMAP_CACHE_SIZE = 512  # Rendered tiles kept in memory
+HEATMAP_CACHE_DIRECTORY = 'heat_cache'  # Disk cache of rendered tiles
+HEATMAP_CACHE_DISK_BYTES = 256 * 1024 * 1024  # Disk cache limit (least recently used tiles pruned)
+HEATMAP_MAX_AGE = 3600  # Cache-Control max-age for heatmap tiles (seconds)
+
+# Fire Tiles (/fires/{z}/{x}/{y}); zooms below AGGREGATE_BELOW_ZOOM get clusters
+FIRE_TILE_MAX_ZOOM = 14  # Deepest zoom served
+FIRE_TILE_MAX_POINTS = 5000  # Points per tile before it is sent as clusters instead
+FIRE_TILE_MAX_CLUSTERED = 500000  # Most events read to cluster one tile
+FIRE_TILE_CACHE_SIZE = 1024  # Encoded tiles kept in memory
+FIRE_TILE_CACHE_DIRECTORY = 'fire_tile_cache'  # Disk cache of encoded tiles
+FIRE_TILE_CACHE_DISK_BYTES = 256 * 1024 * 1024  # Disk cache limit (least recently used tiles pruned)
+FIRE_TILE_MAX_AGE = 300  # Cache-Control max-age for tiles of open or unversioned windows (seconds)
+IMMUTABLE_MAX_AGE = 31536000  # max-age of immutable tiles (fixed window, current data version)
 
 # OSM Tile Server (for downloading)
 OSM_TILE_SERVERS = [
@@ -130,16 +248,23 @@ OSM_TILE_SERVERS = [
 ]
 
 # Rate limiting for tile downloads
-TILE_DOWNLOAD_DELAY = 0.5  # Seconds between tile downloads
-MAX_DOWNLOAD_THREADS = 2  # Maximum concurrent downloads
+TILE_DOWNLOAD_DELAY = 0.5  # Seconds between tile requests (token bucket shared by all threads)
+MAX_DOWNLOAD_THREADS = 2  # Maximum concurrent downloads (and pooled connections per mirror)
+TILE_DOWNLOAD_RETRIES = 4  # Retries of a tile after timeouts, 429 and 5xx responses
+TILE_DOWNLOAD_BACKOFF = 1.0  # Seconds before the first retry, doubled each retry with +-50% jitter
+TILE_DOWNLOAD_TIMEOUT = 30  # Seconds per tile request
+TILE_DOWNLOAD_QUEUE_PER_THREAD = 4  # Tiles submitted ahead per download thread (bounds memory on large boxes)
 
 # WebSocket Configuration
 WEBSOCKET_PING_INTERVAL = 25  # Ping interval in seconds
 WEBSOCKET_PING_TIMEOUT = 60  # Ping timeout in seconds
 
 # UI Configuration
-UI_UPDATE_INTERVAL = 100  # Milliseconds between UI updates
+UI_UPDATE_INTERVAL = 100  # Milliseconds between UI updates (also the playback tick rate)
 STATISTICS_UPDATE_INTERVAL = 1000  # Milliseconds between statistics updates
+STATISTICS_WINDOWS = {'24h': 24, '7d': 168}  # Rolling windows in hours of simulated time
+STATISTICS_FRP_ACCURACY = 0.01  # Relative accuracy of the FRP quantile sketch
+STATISTICS_FRP_QUANTILES = [0.5, 0.9, 0.99]  # FRP quantiles reported in rolling statistics
 
 # About Panel Content
 ABOUT_TITLE = "Ukraine Fire Tracking System"
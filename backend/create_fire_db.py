@@ -10,6 +10,9 @@ import random
 from datetime import datetime, timedelta
 import os
 
+from spatial_index import RTREE_TABLE, create_spatial_index, populate_spatial_index
+from fire_rollups import create_rollups, drop_rollups, refresh_rollups
+
 def create_database(db_path: str = "fire_data.db"):
     """Create SQLite database with fire_events table."""
     
@@ -19,6 +22,8 @@ def create_database(db_path: str = "fire_data.db"):
     
     # Drop existing table if it exists
     cursor.execute("DROP TABLE IF EXISTS fire_events")
+    cursor.execute(f"DROP TABLE IF EXISTS {RTREE_TABLE}")
+    drop_rollups(conn)
     
     # Create table with unified schema
     cursor.execute("""
@@ -45,6 +50,8 @@ def create_database(db_path: str = "fire_data.db"):
     cursor.execute("CREATE INDEX idx_datetime ON fire_events(datetime_utc)")
     cursor.execute("CREATE INDEX idx_location ON fire_events(latitude, longitude)")
     cursor.execute("CREATE INDEX idx_datetime_location ON fire_events(datetime_utc, latitude, longitude)")
+    create_spatial_index(conn)
+    create_rollups(conn)
     
     conn.commit()
     print(f"Created database: {db_path}")
@@ -184,6 +191,8 @@ def insert_events(conn, cursor, events):
             event["version"]
         ))
     
+    populate_spatial_index(conn)
+    refresh_rollups(conn)
     conn.commit()
     print(f"Inserted {len(events)} fire events into database")
 
@@ -13,6 +13,9 @@ import os
 import sys
 from typing import Dict, List, Any, Optional
 
+from spatial_index import RTREE_TABLE, create_spatial_index, populate_spatial_index
+from fire_rollups import create_rollups, drop_rollups, refresh_rollups
+
 class FireDataETL:
     """ETL processor for fire detection data from NASA FIRMS."""
     
@@ -28,8 +31,10 @@ class FireDataETL:
         self.conn = sqlite3.connect(self.db_path)
         self.cursor = self.conn.cursor()
         
-        # Drop existing table if it exists
+        # Drop existing tables if they exist
         self.cursor.execute("DROP TABLE IF EXISTS fire_events")
+        self.cursor.execute(f"DROP TABLE IF EXISTS {RTREE_TABLE}")
+        drop_rollups(self.conn)
         
         # Create table with unified schema
         self.cursor.execute("""
@@ -57,6 +62,10 @@ class FireDataETL:
         self.cursor.execute("CREATE INDEX idx_location ON fire_events(latitude, longitude)")
         self.cursor.execute("CREATE INDEX idx_datetime_location ON fire_events(datetime_utc, latitude, longitude)")
         
+        # R*Tree over (latitude, longitude, time) for bbox and viewport queries
+        create_spatial_index(self.conn)
+        create_rollups(self.conn)
+        
         self.conn.commit()
         print(f"Created database: {self.db_path}")
         
@@ -242,6 +251,18 @@ class FireDataETL:
         
         self.total_records = processed
         print(f"\nSuccessfully loaded {self.total_records} records into database")
+        
+        # Bulk-load the spatial index once the table is complete
+        print("Building spatial index...")
+        indexed = populate_spatial_index(self.conn)
+        self.conn.commit()
+        print(f"  Indexed {indexed} records in {RTREE_TABLE}")
+        
+        # Hourly/daily rollups; later loads only fold in the new ids
+        print("Building rollups...")
+        rolled_up = refresh_rollups(self.conn)
+        self.conn.commit()
+        print(f"  Rolled up {rolled_up} records")
     
     def verify_database(self):
         """Verify database integrity and display statistics."""
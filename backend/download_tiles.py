@@ -1,55 +1,34 @@
 #!/usr/bin/env python3
 """
 Tile downloader for Ukraine Fire Tracking System.
-Downloads OpenStreetMap tiles for offline use at multiple zoom levels.
+Downloads OpenStreetMap tiles for offline use at multiple zoom levels, into
+a single MBTiles file (default) or the {z}/{x}/{y}.png directory layout.
+
+Requests go through one pooled HTTP session per mirror, are paced by a
+shared token bucket (one request per TILE_DOWNLOAD_DELAY) and retried with
+jittered exponential backoff. Finished tiles are appended to a manifest
+next to the store, so a resumed run skips them without probing the store.
+
+Usage:
+    python download_tiles.py [zoom ...]         # download into config.TILE_STORE_FORMAT
+    python download_tiles.py --directory ...    # download into the directory layout
+    python download_tiles.py --server=URL ...   # download from URL instead of OSM_TILE_SERVERS
+    python download_tiles.py --pack             # copy the directory layout into the MBTiles file
 """
 
 import os
+import random
 import requests
+import threading
 import time
-import math
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Tuple, List
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import cycle
+from typing import Iterator, Tuple, List, Optional, Set
+from requests.adapters import HTTPAdapter
 import config
-
-
-def lat_lon_to_tile(lat: float, lon: float, zoom: int) -> Tuple[int, int]:
-    """
-    Convert latitude/longitude to tile numbers for given zoom level.
-    
-    Args:
-        lat: Latitude in decimal degrees
-        lon: Longitude in decimal degrees  
-        zoom: Zoom level
-        
-    Returns:
-        Tuple of (x, y) tile coordinates
-    """
-    lat_rad = math.radians(lat)
-    n = 2.0 ** zoom
-    x = int((lon + 180.0) / 360.0 * n)
-    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
-    return x, y
-
-
-def tile_to_lat_lon(x: int, y: int, zoom: int) -> Tuple[float, float]:
-    """
-    Convert tile coordinates to latitude/longitude.
-    
-    Args:
-        x: Tile X coordinate
-        y: Tile Y coordinate
-        zoom: Zoom level
-        
-    Returns:
-        Tuple of (lat, lon) in decimal degrees
-    """
-    n = 2.0 ** zoom
-    lon_deg = x / n * 360.0 - 180.0
-    lat_rad = math.atan(math.sinh(math.pi * (1 - 2 * y / n)))
-    lat_deg = math.degrees(lat_rad)
-    return lat_deg, lon_deg
+from tile_math import lat_lon_to_tile
+from tile_store import DIRECTORY_MANIFEST, DirectoryTileStore, MBTilesStore
 
 
 def calculate_tile_bounds(north: float, south: float, east: float, west: float, zoom: int) -> Tuple[int, int, int, int]:
@@ -76,71 +55,222 @@ def calculate_tile_bounds(north: float, south: float, east: float, west: float,
     return x_min, y_min, x_max, y_max
 
 
-def download_tile(server_url: str, zoom: int, x: int, y: int, output_dir: str) -> bool:
+TILE_USER_AGENT = 'Ukraine Fire Tracking System/1.0 (Educational Research Project)'
+
+# Statuses worth retrying (anything else but 200 is a permanent failure)
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: rate requests per second with bursts of up to capacity."""
+    
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """Initialize full; a rate of 0 or less disables limiting."""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available and take it."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class MirrorPool:
+    """Round-robin over tile mirrors, each with its own keep-alive session."""
+    
+    def __init__(self, servers: List[str], pool_size: int):
+        """Open one session per mirror with a connection pool of pool_size."""
+        self.sessions = []
+        for server in servers:
+            session = requests.Session()
+            session.headers['User-Agent'] = TILE_USER_AGENT
+            session.mount(server, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0))
+            self.sessions.append((server.rstrip('/'), session))
+        self.order = cycle(self.sessions)
+        self.lock = threading.Lock()
+    
+    def next(self) -> Tuple[str, requests.Session]:
+        """(server URL, session) of the next mirror."""
+        with self.lock:
+            return next(self.order)
+    
+    def close(self):
+        """Close every session."""
+        for _, session in self.sessions:
+            session.close()
+
+
+class DownloadManifest:
     """
-    Download a single tile from OSM server.
+    Append-only list of finished tiles ("z/x/y" per line).
     
-    Args:
-        server_url: Base URL of tile server
-        zoom: Zoom level
-        x, y: Tile coordinates
-        output_dir: Directory to save tile
-        
-    Returns:
-        True if successful, False otherwise
+    Tiles are recorded as pending and written out by commit(), which the
+    caller runs after flushing the store, so the manifest never lists a tile
+    the store has not persisted.
     """
-    # Create directory structure
-    tile_dir = os.path.join(output_dir, str(zoom), str(x))
-    os.makedirs(tile_dir, exist_ok=True)
     
-    tile_path = os.path.join(tile_dir, f"{y}.png")
+    def __init__(self, path: str):
+        """Initialize for a manifest file (created on first commit)."""
+        self.path = path
+        self.pending: List[Tuple[int, int, int]] = []
     
-    # Skip if already exists
-    if os.path.exists(tile_path) and os.path.getsize(tile_path) > 0:
-        return True
+    def load(self) -> Set[Tuple[int, int, int]]:
+        """Tiles listed in the manifest (empty if there is none)."""
+        done = set()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    parts = line.strip().split('/')
+                    if len(parts) == 3 and all(part.isdigit() for part in parts):
+                        done.add(tuple(int(part) for part in parts))
+        return done
     
-    # Build URL
-    url = f"{server_url}/{zoom}/{x}/{y}.png"
+    def record(self, z: int, x: int, y: int):
+        """Mark a tile as finished (written on the next commit)."""
+        self.pending.append((z, x, y))
     
-    try:
-        headers = {
-            'User-Agent': 'Ukraine Fire Tracking System/1.0 (Educational Research Project)'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
+    def commit(self):
+        """Append the pending tiles to the manifest file."""
+        if not self.pending:
+            return
+        with open(self.path, 'a') as f:
+            f.writelines(f"{z}/{x}/{y}\n" for z, x, y in self.pending)
+        self.pending = []
+
+
+def download_tile(mirrors: MirrorPool, limiter: TokenBucket, zoom: int, x: int, y: int,
+                  retries: int, backoff: float, timeout: float) -> Optional[bytes]:
+    """
+    Download a single tile, retrying transient failures on the next mirror.
+    
+    Args:
+        mirrors: Mirror sessions to take turns on
+        limiter: Shared rate limiter (every attempt takes a token)
+        zoom: Zoom level
+        x, y: Tile coordinates
+        retries: Retries after the first attempt
+        backoff: Base delay in seconds, doubled per retry and jittered by +-50%
+        timeout: Per-request timeout in seconds
         
-        if response.status_code == 200:
-            with open(tile_path, 'wb') as f:
-                f.write(response.content)
-            return True
-        else:
-            print(f"    Failed to download {zoom}/{x}/{y}: HTTP {response.status_code}")
-            return False
-            
-    except Exception as e:
-        print(f"    Error downloading {zoom}/{x}/{y}: {e}")
-        return False
+    Returns:
+        Tile bytes, or None if the tile could not be downloaded
+    """
+    for attempt in range(retries + 1):
+        server_url, session = mirrors.next()
+        limiter.acquire()
+        delay = backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+        try:
+            response = session.get(f"{server_url}/{zoom}/{x}/{y}.png", timeout=timeout)
+            if response.status_code == 200:
+                return response.content
+            if response.status_code not in RETRY_STATUSES:
+                print(f"    Failed to download {zoom}/{x}/{y}: HTTP {response.status_code}")
+                return None
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            error = f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            error = str(e)
+        if attempt < retries:
+            time.sleep(delay)
+    print(f"    Giving up on {zoom}/{x}/{y} after {retries + 1} attempts: {error}")
+    return None
 
 
 class TileDownloader:
     """Manages downloading tiles for multiple zoom levels."""
     
-    def __init__(self):
-        """Initialize tile downloader."""
-        self.servers = config.OSM_TILE_SERVERS
-        self.current_server = 0
+    def __init__(self, store_format: str = None, servers: List[str] = None, delay: float = None):
+        """
+        Initialize tile downloader writing to an 'mbtiles' or 'directory' store,
+        from the given mirrors (default: OSM_TILE_SERVERS) at one request per
+        delay seconds (default: TILE_DOWNLOAD_DELAY).
+        """
+        self.servers = servers or config.OSM_TILE_SERVERS
         self.output_dir = config.TILE_DIRECTORY
-        self.delay = config.TILE_DOWNLOAD_DELAY
+        self.delay = config.TILE_DOWNLOAD_DELAY if delay is None else delay
         self.max_workers = config.MAX_DOWNLOAD_THREADS
+        self.store_format = store_format or config.TILE_STORE_FORMAT
         
         # Ensure output directory exists
         config.ensure_directories()
+        
+        if self.store_format == 'mbtiles':
+            self.output_path = config.TILE_MBTILES_PATH
+            manifest_path = f"{self.output_path}.manifest"
+        else:
+            self.output_path = self.output_dir
+            manifest_path = os.path.join(self.output_dir, DIRECTORY_MANIFEST)
+        
+        # A manifest without its MBTiles file describes tiles that no longer exist
+        if self.store_format == 'mbtiles' and not os.path.exists(self.output_path) and os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        seed_manifest = not os.path.exists(manifest_path)
+        
+        if self.store_format == 'mbtiles':
+            self.store = MBTilesStore(self.output_path, readonly=False, metadata=self.get_metadata())
+        else:
+            self.store = DirectoryTileStore(self.output_dir)
+        
+        self.manifest = DownloadManifest(manifest_path)
+        if seed_manifest:
+            # First run against an existing store: list what it holds once
+            for zoom, x, y in self.store.iter_tiles():
+                self.manifest.record(zoom, x, y)
+            self.manifest.commit()
+        self.completed = self.manifest.load()
+        
+        self.mirrors = MirrorPool(self.servers, self.max_workers)
+        self.limiter = TokenBucket(1.0 / self.delay if self.delay > 0 else 0.0)
+    
+    def get_metadata(self) -> dict:
+        """MBTiles metadata for the configured region."""
+        bounds = config.BOUNDING_BOX
+        return {
+            'name': 'U_Drone base map',
+            'format': 'png',
+            'type': 'baselayer',
+            'version': '1.0',
+            'bounds': f"{bounds['west']},{bounds['south']},{bounds['east']},{bounds['north']}",
+            'minzoom': str(min(config.ZOOM_LEVELS)),
+            'maxzoom': str(max(config.ZOOM_LEVELS)),
+            'attribution': '(c) OpenStreetMap contributors'
+        }
     
-    def get_next_server(self) -> str:
-        """Get next server URL for round-robin load balancing."""
-        server = self.servers[self.current_server]
-        self.current_server = (self.current_server + 1) % len(self.servers)
-        return server
+    def pack_directory(self) -> int:
+        """Copy every tile of the directory layout into the MBTiles store; returns tiles copied."""
+        source = DirectoryTileStore(self.output_dir)
+        copied = 0
+        zooms = set()
+        for zoom, x, y in source.iter_tiles():
+            self.store.put_tile(zoom, x, y, source.get_tile(zoom, x, y))
+            zooms.add(zoom)
+            copied += 1
+        if zooms:
+            self.store.set_metadata('minzoom', str(min(zooms)))
+            self.store.set_metadata('maxzoom', str(max(zooms)))
+        self.store.flush()
+        print(f"Packed {copied} tiles from {self.output_dir} into {self.output_path}")
+        return copied
+    
+    def close(self):
+        """Close the store and the mirror sessions."""
+        self.store.close()
+        self.mirrors.close()
     
     def estimate_tiles(self, zoom_levels: List[int]) -> dict:
         """
@@ -167,6 +297,14 @@ class TileDownloader:
         
         return estimates
     
+    def remaining_tiles(self, zoom: int, x_min: int, y_min: int,
+                        x_max: int, y_max: int) -> Iterator[Tuple[int, int, int]]:
+        """Tiles of a zoom level's bounds that the manifest does not list as finished."""
+        for x in range(x_min, x_max + 1):
+            for y in range(y_min, y_max + 1):
+                if (zoom, x, y) not in self.completed:
+                    yield zoom, x, y
+    
     def download_zoom_level(self, zoom: int) -> bool:
         """
         Download all tiles for a specific zoom level.
@@ -193,61 +331,67 @@ class TileDownloader:
         print(f"Tile bounds: X({x_min}-{x_max}), Y({y_min}-{y_max})")
         print(f"Total tiles to download: {total_tiles}")
         
-        # Generate list of all tiles to download
-        tile_list = []
-        for x in range(x_min, x_max + 1):
-            for y in range(y_min, y_max + 1):
-                tile_list.append((zoom, x, y))
-        
-        # Filter out existing tiles
-        remaining_tiles = []
-        for zoom_level, x, y in tile_list:
-            tile_path = os.path.join(self.output_dir, str(zoom_level), str(x), f"{y}.png")
-            if not os.path.exists(tile_path) or os.path.getsize(tile_path) == 0:
-                remaining_tiles.append((zoom_level, x, y))
+        # Tiles the manifest does not list as finished, generated lazily
+        remaining_count = sum(1 for _ in self.remaining_tiles(zoom, x_min, y_min, x_max, y_max))
         
-        if not remaining_tiles:
+        if not remaining_count:
             print(f"All tiles already downloaded for zoom level {zoom}")
             return True
         
-        print(f"Need to download {len(remaining_tiles)} tiles (skipping {total_tiles - len(remaining_tiles)} existing)")
+        print(f"Need to download {remaining_count} tiles (skipping {total_tiles - remaining_count} existing)")
+        print(f"Expected time: ~{remaining_count * self.delay / 60:.1f} minutes")
         
         # Download tiles with progress tracking
         downloaded = 0
         failed = 0
         
-        # Use ThreadPoolExecutor for concurrent downloads
+        # Workers only fetch (paced by the shared token bucket); this thread writes the store.
+        # Only a bounded window of tiles is submitted, refilled as downloads finish.
+        tiles = self.remaining_tiles(zoom, x_min, y_min, x_max, y_max)
+        window = self.max_workers * config.TILE_DOWNLOAD_QUEUE_PER_THREAD
+        in_flight = {}
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit download tasks
-            future_to_tile = {}
-            for zoom_level, x, y in remaining_tiles:
-                server_url = self.get_next_server()
-                future = executor.submit(download_tile, server_url, zoom_level, x, y, self.output_dir)
-                future_to_tile[future] = (zoom_level, x, y)
-                
-                # Add delay between submissions to be respectful
-                time.sleep(self.delay / self.max_workers)
-            
-            # Process completed downloads
-            for future in as_completed(future_to_tile):
-                zoom_level, x, y = future_to_tile[future]
+            while True:
+                for zoom_level, x, y in tiles:
+                    future = executor.submit(download_tile, self.mirrors, self.limiter, zoom_level, x, y,
+                                             config.TILE_DOWNLOAD_RETRIES, config.TILE_DOWNLOAD_BACKOFF,
+                                             config.TILE_DOWNLOAD_TIMEOUT)
+                    in_flight[future] = (zoom_level, x, y)
+                    if len(in_flight) >= window:
+                        break
+                if not in_flight:
+                    break
                 
-                try:
-                    success = future.result()
-                    if success:
+                # Process completed downloads
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    zoom_level, x, y = in_flight.pop(future)
+                    
+                    try:
+                        data = future.result()
+                    except Exception as e:
+                        print(f"    Exception downloading {zoom_level}/{x}/{y}: {e}")
+                        data = None
+                    
+                    if data:
+                        self.store.put_tile(zoom_level, x, y, data)
+                        self.manifest.record(zoom_level, x, y)
+                        self.completed.add((zoom_level, x, y))
                         downloaded += 1
                     else:
                         failed += 1
-                except Exception as e:
-                    print(f"    Exception downloading {zoom_level}/{x}/{y}: {e}")
-                    failed += 1
-                
-                # Progress update
-                total_processed = downloaded + failed
-                if total_processed % 100 == 0 or total_processed == len(remaining_tiles):
-                    progress = (total_processed / len(remaining_tiles)) * 100
-                    print(f"  Progress: {total_processed}/{len(remaining_tiles)} "
-                          f"({progress:.1f}%) - Downloaded: {downloaded}, Failed: {failed}")
+                    
+                    # Progress update (and checkpoint, so an interrupted run resumes from here)
+                    total_processed = downloaded + failed
+                    if total_processed % 100 == 0 or total_processed == remaining_count:
+                        self.store.flush()
+                        self.manifest.commit()
+                        progress = (total_processed / remaining_count) * 100
+                        print(f"  Progress: {total_processed}/{remaining_count} "
+                              f"({progress:.1f}%) - Downloaded: {downloaded}, Failed: {failed}")
+        
+        self.store.flush()
+        self.manifest.commit()
         
         print(f"\nZoom level {zoom} complete!")
         print(f"Successfully downloaded: {downloaded}")
@@ -272,7 +416,8 @@ class TileDownloader:
         print("=" * 60)
         print(f"Geographic region: {config.BOUNDING_BOX}")
         print(f"Zoom levels: {zoom_levels}")
-        print(f"Output directory: {self.output_dir}")
+        print(f"Output: {self.output_path} ({self.store_format})")
+        print(f"Mirrors: {', '.join(self.servers)}")
         print(f"Max concurrent downloads: {self.max_workers}")
         print(f"Delay between requests: {self.delay}s")
         
@@ -285,8 +430,9 @@ class TileDownloader:
             print(f"  Zoom {zoom}: ~{count} tiles")
         print(f"Total estimated tiles: ~{total_estimate}")
         
-        # Calculate estimated download time
-        estimated_time_minutes = (total_estimate * self.delay) / 60
+        # Calculate estimated download time (the token bucket paces every request)
+        remaining_estimate = total_estimate - sum(1 for zoom, _, _ in self.completed if zoom in estimates)
+        estimated_time_minutes = (max(remaining_estimate, 0) * self.delay) / 60
         print(f"Estimated download time: ~{estimated_time_minutes:.1f} minutes")
         
         # Auto-proceed for now (can be made interactive later)
@@ -313,7 +459,7 @@ class TileDownloader:
         print(f"Download Complete!")
         print(f"{'='*60}")
         print(f"Total time: {total_time/60:.1f} minutes")
-        print(f"Output directory: {self.output_dir}")
+        print(f"Output: {self.output_path}")
         
         # Verify downloads
         self.verify_downloads(zoom_levels)
@@ -330,21 +476,7 @@ class TileDownloader:
         print(f"\nVerifying downloads...")
         
         for zoom in zoom_levels:
-            zoom_dir = os.path.join(self.output_dir, str(zoom))
-            if not os.path.exists(zoom_dir):
-                print(f"  Zoom {zoom}: Directory not found")
-                continue
-            
-            # Count tiles
-            tile_count = 0
-            for x_dir in os.listdir(zoom_dir):
-                x_path = os.path.join(zoom_dir, x_dir)
-                if os.path.isdir(x_path):
-                    for tile_file in os.listdir(x_path):
-                        if tile_file.endswith('.png'):
-                            tile_path = os.path.join(x_path, tile_file)
-                            if os.path.getsize(tile_path) > 0:
-                                tile_count += 1
+            tile_count = self.store.count_tiles(zoom)
             
             # Calculate expected tiles
             bounds = config.BOUNDING_BOX
@@ -361,10 +493,20 @@ class TileDownloader:
 
 def main():
     """Main entry point."""
-    if len(sys.argv) > 1:
+    flags = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+    servers = [flag.split('=', 1)[1] for flag in flags if flag.startswith('--server=')]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    
+    if '--pack' in flags:
+        downloader = TileDownloader('mbtiles')
+        downloader.pack_directory()
+        downloader.close()
+        return
+    
+    if args:
         # Specific zoom levels provided
         try:
-            zoom_levels = [int(z) for z in sys.argv[1:]]
+            zoom_levels = [int(z) for z in args]
             print(f"Downloading zoom levels: {zoom_levels}")
         except ValueError:
             print("Error: Invalid zoom level. Use integers only.")
@@ -379,8 +521,9 @@ def main():
         sys.exit(1)
     
     # Create downloader and run
-    downloader = TileDownloader()
+    downloader = TileDownloader('directory' if '--directory' in flags else None, servers or None)
     success = downloader.download_all_levels(zoom_levels)
+    downloader.close()
     
     if success:
         print("\nTile download completed successfully!")
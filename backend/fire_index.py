@@ -0,0 +1,343 @@
+"""
+In-memory columnar index of fire events for playback.
+Loads the fire_events table once into time-sorted NumPy arrays so each
+playback interval becomes two binary searches and a handful of array slices.
+"""
+
+import sqlite3
+import calendar
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from fire_rollups import data_version
+from tile_math import tile_to_lat_lon
+
+logger = logging.getLogger(__name__)
+
+# Float columns and the number of decimals reported for them.
+# Values are stored as float32 (coordinates as float64, see COORDINATE_COLUMNS)
+# and rounded back when records are built.
+FLOAT_COLUMNS = {
+    'latitude': 5,
+    'longitude': 5,
+    'brightness': 2,
+    'bright_t31': 2,
+    'frp': 2,
+    'scan': 2,
+    'track': 2
+}
+
+# Kept at full precision so points on grid cell edges bin as they do in SQLite
+COORDINATE_COLUMNS = ['latitude', 'longitude']
+
+# Text columns stored as small integer codes into a lookup table
+CATEGORICAL_COLUMNS = ['confidence', 'satellite', 'instrument', 'daynight', 'version']
+
+# Column order of the records produced for playback (matches fire_events)
+RECORD_COLUMNS = [
+    'id', 'datetime_utc', 'latitude', 'longitude', 'brightness', 'bright_t31',
+    'frp', 'confidence', 'scan', 'track', 'satellite', 'instrument',
+    'daynight', 'type', 'version'
+]
+
+
+def datetime_to_epoch(dt: datetime) -> int:
+    """Convert a naive UTC datetime to whole epoch seconds."""
+    return calendar.timegm(dt.timetuple())
+
+
+def mercator_xy(latitude: np.ndarray, longitude: np.ndarray, scale: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized Web Mercator projection onto a square world of scale units a side.
+
+    Same projection as tile_math.lat_lon_to_tile, kept fractional: scale
+    2**z gives tile coordinates, 256 * 2**z pixels.
+    """
+    x = (longitude + 180.0) / 360.0 * scale
+    y = (1.0 - np.arcsinh(np.tan(np.radians(latitude))) / np.pi) / 2.0 * scale
+    return x, y
+
+
+def grid_cells(latitude: np.ndarray, longitude: np.ndarray, zoom: int,
+               grid_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Integer (x, y) of the grid_size x grid_size cells per tile at zoom that points fall in."""
+    scale = (1 << zoom) * grid_size
+    x, y = mercator_xy(latitude, longitude, scale)
+    return (np.clip(np.floor(x), 0, scale - 1).astype(np.int64),
+            np.clip(np.floor(y), 0, scale - 1).astype(np.int64))
+
+
+def bin_clusters(latitude: np.ndarray, longitude: np.ndarray, frp: np.ndarray,
+                 codes: np.ndarray, labels: np.ndarray, zoom: int, grid_size: int) -> List[Dict[str, Any]]:
+    """
+    Bin points into clusters on the Web Mercator tile grid.
+
+    Each tile at zoom is split into grid_size x grid_size cells (the tiles
+    of zoom + log2(grid_size)). Returns one cluster per occupied cell with
+    its center, count, max FRP, most common confidence (labels[codes]) and
+    the tile it belongs to. Shared by playback aggregation and fire tiles.
+    """
+    if len(latitude) == 0:
+        return []
+    scale = (1 << zoom) * grid_size
+    gx, gy = grid_cells(latitude, longitude, zoom, grid_size)
+
+    cells, inverse = np.unique(gy * scale + gx, return_inverse=True)
+    inverse = inverse.ravel()
+    counts = np.bincount(inverse, minlength=len(cells))
+
+    max_frp = np.full(len(cells), -np.inf, dtype=np.float64)
+    np.maximum.at(max_frp, inverse, np.nan_to_num(frp.astype(np.float64)))
+
+    codes = codes.astype(np.int64).ravel()
+    tallies = np.bincount(inverse * len(labels) + codes, minlength=len(cells) * len(labels))
+    dominant = labels[tallies.reshape(len(cells), len(labels)).argmax(axis=1)]
+
+    cell_x = cells % scale
+    cell_y = cells // scale
+    center_lon = (cell_x + 0.5) / scale * 360.0 - 180.0
+    center_lat = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * (cell_y + 0.5) / scale))))
+
+    clusters = []
+    for lat, lon, count, peak, confidence, x, y in zip(
+            np.round(center_lat, 5).tolist(), np.round(center_lon, 5).tolist(),
+            counts.tolist(), np.round(max_frp, 2).tolist(), dominant.tolist(),
+            (cell_x // grid_size).tolist(), (cell_y // grid_size).tolist()):
+        clusters.append({
+            'latitude': lat,
+            'longitude': lon,
+            'count': count,
+            'max_frp': peak,
+            'confidence': confidence,
+            'tile': [zoom, x, y]
+        })
+    return clusters
+
+
+class FireEventIndex:
+    """Time-sorted columnar copy of the fire_events table."""
+
+    def __init__(self, db_path: str):
+        """Initialize an empty index for the given database."""
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.is_loaded = False
+        self.load_failed = False
+        # Rollup data version of the loaded events (None if unknown)
+        self.version: Optional[str] = None
+
+        self.size = 0
+        self.epoch = None
+        self.columns: Dict[str, Any] = {}
+        self.categories: Dict[str, Any] = {}
+
+    def load(self) -> bool:
+        """
+        Load all fire events from SQLite into sorted column arrays.
+
+        The data version is read in the same transaction as the rows, so
+        version always describes exactly the events loaded.
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                version = data_version(conn)
+            except sqlite3.OperationalError:
+                # No rollup state yet
+                version = None
+            cursor.execute(f"""
+                SELECT {', '.join(RECORD_COLUMNS)} FROM fire_events
+                ORDER BY datetime_utc, id
+            """)
+            rows = cursor.fetchall()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Failed to load fire event index: {e}")
+            self.load_failed = True
+            return False
+
+        values = dict(zip(RECORD_COLUMNS, zip(*rows))) if rows else {
+            name: () for name in RECORD_COLUMNS
+        }
+
+        epoch = np.array(values['datetime_utc'], dtype='datetime64[s]').astype(np.int64)
+        order = np.argsort(epoch, kind='stable')
+
+        columns = {
+            'id': np.array(values['id'], dtype=np.int32)[order],
+            'type': np.array(values['type'], dtype=np.int8)[order]
+        }
+        for name in FLOAT_COLUMNS:
+            dtype = np.float64 if name in COORDINATE_COLUMNS else np.float32
+            columns[name] = np.array(values[name], dtype=dtype)[order]
+
+        categories = {}
+        for name in CATEGORICAL_COLUMNS:
+            labels, codes = np.unique(np.array(values[name], dtype=object).astype(str),
+                                      return_inverse=True)
+            code_type = np.uint8 if len(labels) <= 256 else np.uint16
+            columns[name] = codes.astype(code_type)[order]
+            categories[name] = labels.astype(object)
+
+        with self.lock:
+            self.epoch = epoch[order]
+            self.columns = columns
+            self.categories = categories
+            self.size = len(order)
+            self.version = version
+            self.is_loaded = True
+            self.load_failed = False
+
+        logger.info(f"Fire event index loaded with {self.size} events")
+        return True
+
+    def ensure_loaded(self) -> bool:
+        """Load the index on first use; returns False if it is unavailable."""
+        if self.is_loaded:
+            return True
+        with self.lock:
+            if self.is_loaded:
+                return True
+            if self.load_failed:
+                return False
+            return self.load()
+
+    def interval_bounds(self, start_dt: datetime, end_dt: datetime,
+                        include_start: bool = False) -> Tuple[int, int]:
+        """
+        Find the row range for a time interval.
+
+        Matches the SQL playback predicate `datetime_utc > start AND
+        datetime_utc <= end`, or `>= start` when include_start is set.
+        """
+        side = 'left' if include_start else 'right'
+        lo = int(np.searchsorted(self.epoch, datetime_to_epoch(start_dt), side=side))
+        hi = int(np.searchsorted(self.epoch, datetime_to_epoch(end_dt), side='right'))
+        return lo, max(lo, hi)
+
+    def count_range(self, start_dt: datetime, end_dt: datetime) -> int:
+        """Count events with start <= datetime_utc <= end."""
+        lo, hi = self.interval_bounds(start_dt, end_dt, include_start=True)
+        return hi - lo
+
+    def interval_rows(self, start_dt: datetime, end_dt: datetime,
+                      bbox: Optional[Dict[str, float]] = None):
+        """
+        Select the rows of a time interval, optionally inside a bounding box.
+
+        The time bounds come from the sorted epoch array; the box is then a
+        vectorized mask over that slice only. Returns a slice or index array.
+        """
+        lo, hi = self.interval_bounds(start_dt, end_dt)
+        if not bbox or hi <= lo:
+            return slice(lo, hi)
+
+        latitude = self.columns['latitude'][lo:hi]
+        longitude = self.columns['longitude'][lo:hi]
+        mask = ((latitude >= bbox['south']) & (latitude <= bbox['north']) &
+                (longitude >= bbox['west']) & (longitude <= bbox['east']))
+        return np.flatnonzero(mask) + lo
+
+    def column_values(self, name: str, rows) -> List[Any]:
+        """Python values of one column for a row slice or index array."""
+        if name == 'datetime_utc':
+            timestamps = np.datetime_as_string(self.epoch[rows].astype('datetime64[s]'))
+            return np.char.replace(timestamps, 'T', ' ').tolist()
+        if name in FLOAT_COLUMNS:
+            values = self.columns[name][rows].astype(np.float64)
+            return np.round(values, FLOAT_COLUMNS[name]).tolist()
+        if name in CATEGORICAL_COLUMNS:
+            return self.categories[name][self.columns[name][rows]].tolist()
+        return self.columns[name][rows].tolist()
+
+    def build_records(self, rows, fade_duration: float,
+                      fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Build playback record dicts for a row slice or index array, limited to fields."""
+        if len(self.epoch[rows]) == 0:
+            return []
+
+        fields = fields or RECORD_COLUMNS
+        ordered = [self.column_values(name, rows) for name in fields]
+        records = []
+        for row in zip(*ordered):
+            record = dict(zip(fields, row))
+            record['fade_duration'] = fade_duration
+            records.append(record)
+        return records
+
+    def query_interval(self, start_dt: datetime, end_dt: datetime, fade_duration: float,
+                       fields: Optional[List[str]] = None,
+                       bbox: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """Return records with start < datetime_utc <= end (inside bbox if given), ordered by time."""
+        rows = self.interval_rows(start_dt, end_dt, bbox)
+        return self.build_records(rows, fade_duration, fields)
+
+    def count_interval(self, start_dt: datetime, end_dt: datetime,
+                       bbox: Optional[Dict[str, float]] = None) -> int:
+        """Count events with start < datetime_utc <= end (inside bbox if given)."""
+        return len(self.epoch[self.interval_rows(start_dt, end_dt, bbox)])
+
+    def aggregate_interval(self, start_dt: datetime, end_dt: datetime, zoom: int,
+                           grid_size: int, fade_duration: float,
+                           bbox: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """Bin an interval's events into clusters on the Web Mercator tile grid (see bin_clusters)."""
+        rows = self.interval_rows(start_dt, end_dt, bbox)
+        latitude, longitude = self.coordinates(rows)
+        clusters = bin_clusters(latitude, longitude, self.columns['frp'][rows], self.columns['confidence'][rows],
+                                self.categories['confidence'], zoom, grid_size)
+        for cluster in clusters:
+            cluster['fade_duration'] = fade_duration
+        return clusters
+
+    def coordinates(self, rows) -> Tuple[np.ndarray, np.ndarray]:
+        """Latitude and longitude of rows (float64, as stored in SQLite)."""
+        return self.columns['latitude'][rows], self.columns['longitude'][rows]
+
+    def select_rows(self, start_dt: Optional[datetime] = None, end_dt: Optional[datetime] = None,
+                    filters: Optional[Dict[str, List[str]]] = None,
+                    min_frp: Optional[float] = None) -> np.ndarray:
+        """
+        Rows with start <= datetime_utc <= end (either bound may be open),
+        categorical columns in the given values and frp >= min_frp: the
+        /api/fires filters evaluated on the arrays.
+        """
+        lo = 0 if start_dt is None else int(np.searchsorted(self.epoch, datetime_to_epoch(start_dt), side='left'))
+        hi = self.size if end_dt is None else int(np.searchsorted(self.epoch, datetime_to_epoch(end_dt), side='right'))
+        rows = np.arange(lo, max(lo, hi))
+        for name, values in (filters or {}).items():
+            wanted = np.flatnonzero(np.isin(self.categories[name], values))
+            rows = rows[np.isin(self.columns[name][rows], wanted)]
+        if min_frp is not None:
+            rows = rows[self.columns['frp'][rows] >= min_frp]
+        return rows
+
+    def tile_clusters(self, z: int, x: int, y: int, grid_size: int,
+                      start_dt: Optional[datetime] = None, end_dt: Optional[datetime] = None,
+                      filters: Optional[Dict[str, List[str]]] = None,
+                      min_frp: Optional[float] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        (event count, clusters) of the filtered events inside tile (z, x, y).
+
+        Events are cut to the tile's lat/lon box, then kept only if their
+        cell lies in the tile, so every event belongs to exactly one tile.
+        """
+        rows = self.select_rows(start_dt, end_dt, filters, min_frp)
+        north, west = tile_to_lat_lon(x, y, z)
+        south, east = tile_to_lat_lon(x + 1, y + 1, z)
+        latitude = self.columns['latitude'][rows]
+        longitude = self.columns['longitude'][rows]
+        rows = rows[(latitude >= south) & (latitude <= north) & (longitude >= west) & (longitude <= east)]
+
+        latitude, longitude = self.coordinates(rows)
+        gx, gy = grid_cells(latitude, longitude, z, grid_size)
+        inside = (gx // grid_size == x) & (gy // grid_size == y)
+        rows = rows[inside]
+        return len(rows), bin_clusters(latitude[inside], longitude[inside], self.columns['frp'][rows],
+                                       self.columns['confidence'][rows], self.categories['confidence'],
+                                       z, grid_size)
@@ -0,0 +1,215 @@
+"""
+Bulk queries over fire_events for the /api/fires endpoint.
+Filters compile to one parameterized SELECT ordered by (datetime_utc, id) and
+paginated with keyset cursors; rows are streamed from the SQLite cursor in
+chunks so memory stays flat however large the answer is.
+"""
+
+import csv
+import io
+import json
+import sqlite3
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+from spatial_index import bbox_condition, radius_bbox, register_functions
+from wire_format import encode_stream_record
+
+# Response formats and their content types
+FIRES_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'binary': 'application/octet-stream'
+}
+
+# Query parameters matched against a column with IN (comma-separated values)
+LIST_FILTERS = ['confidence', 'satellite', 'instrument', 'daynight']
+
+
+# Format of fire_events.datetime_utc (bounds are compared to it as text)
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO timestamp ('T' or space separated, optional offset) as naive UTC."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def normalize_dates(args: Dict[str, str]) -> Dict[str, str]:
+    """
+    Copy of args with start_date/end_date rewritten in the stored datetime_utc format.
+
+    Raises ValueError for bounds that do not parse, so callers answer 400.
+    """
+    normalized = dict(args)
+    for name in ('start_date', 'end_date'):
+        if normalized.get(name):
+            normalized[name] = parse_timestamp(normalized[name]).strftime(DATETIME_FORMAT)
+    return normalized
+
+
+def parse_cursor(cursor: str) -> Tuple[str, int]:
+    """Split an 'after' cursor ('<datetime_utc>,<id>' of the last row seen)."""
+    datetime_utc, _, fire_id = cursor.rpartition(',')
+    if not datetime_utc:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return datetime_utc, int(fire_id)
+
+
+def make_cursor(row: Dict[str, Any]) -> str:
+    """Cursor resuming after row."""
+    return f"{row['datetime_utc']},{row['id']}"
+
+
+def parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    """Parse 'west,south,east,north' into floats."""
+    parts = value.split(',')
+    if len(parts) != 4:
+        raise ValueError("bbox must be west,south,east,north")
+    west, south, east, north = (float(part) for part in parts)
+    if south > north or west > east:
+        raise ValueError("bbox must have south <= north and west <= east")
+    return west, south, east, north
+
+
+def build_filter(args: Dict[str, str]) -> Tuple[str, List[Any]]:
+    """
+    Compile request arguments into (WHERE clause, params); the clause is '' without filters.
+
+    The cursor condition uses a row-value comparison so SQLite seeks straight
+    to it on the datetime index instead of skipping rows like OFFSET would.
+    bbox and radius (near=lat,lon with radius_km) queries are pruned on the
+    R*Tree together with the time range, then checked exactly. Time bounds
+    may be ISO 'T' or space separated; they are bound in the stored
+    datetime_utc format.
+    """
+    conditions = []
+    params: List[Any] = []
+
+    start_dt = parse_timestamp(args['start_date']) if args.get('start_date') else None
+    end_dt = parse_timestamp(args['end_date']) if args.get('end_date') else None
+    if start_dt:
+        conditions.append("datetime_utc >= ?")
+        params.append(start_dt.strftime(DATETIME_FORMAT))
+    if end_dt:
+        conditions.append("datetime_utc <= ?")
+        params.append(end_dt.strftime(DATETIME_FORMAT))
+
+    boxes = []
+    if args.get('bbox'):
+        west, south, east, north = parse_bbox(args['bbox'])
+        conditions.append("latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?")
+        params.extend([south, north, west, east])
+        boxes.append((south, north, west, east))
+    if args.get('near'):
+        latitude, longitude = (float(part) for part in args['near'].split(','))
+        radius_km = float(args.get('radius_km', 0))
+        if radius_km <= 0:
+            raise ValueError("radius_km must be positive")
+        conditions.append("distance_km(latitude, longitude, ?, ?) <= ?")
+        params.extend([latitude, longitude, radius_km])
+        boxes.append(radius_bbox(latitude, longitude, radius_km))
+    for south, north, west, east in boxes:
+        spatial_filter, spatial_params = bbox_condition(south, north, west, east, start_dt, end_dt)
+        conditions.append(spatial_filter)
+        params.extend(spatial_params)
+    for name in LIST_FILTERS:
+        if args.get(name):
+            values = args[name].split(',')
+            conditions.append(f"{name} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    if args.get('min_frp'):
+        conditions.append("frp >= ?")
+        params.append(float(args['min_frp']))
+    if args.get('after'):
+        conditions.append("(datetime_utc, id) > (?, ?)")
+        params.extend(parse_cursor(args['after']))
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+
+def build_query(args: Dict[str, str], fields: List[str],
+                limit: int) -> Tuple[str, List[Any]]:
+    """Compile request arguments into (sql, params) for rows ordered by (datetime_utc, id)."""
+    where, params = build_filter(args)
+    sql = f"SELECT {', '.join(fields)} FROM fire_events {where} ORDER BY datetime_utc, id LIMIT ?"
+    return sql, params + [limit]
+
+
+def build_scan_query(args: Dict[str, str], fields: List[str]) -> Tuple[str, List[Any]]:
+    """
+    Compile request arguments into (sql, params) for every matching row, unordered.
+
+    For aggregates that fold in all rows: there is no sort and no limit, so
+    SQLite streams rows as it finds them.
+    """
+    where, params = build_filter(args)
+    return f"SELECT {', '.join(fields)} FROM fire_events {where}", params
+
+
+def iter_chunks(db_path: str, sql: str, params: List[Any],
+                chunk_size: int) -> Iterator[List[Tuple]]:
+    """Yield query results as lists of up to chunk_size row tuples."""
+    conn = sqlite3.connect(db_path)
+    register_functions(conn)
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def iter_rows(db_path: str, sql: str, params: List[Any], fields: List[str],
+              chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Yield query results as lists of up to chunk_size row dicts."""
+    for rows in iter_chunks(db_path, sql, params, chunk_size):
+        yield [dict(zip(fields, row)) for row in rows]
+
+
+def stream_fires(db_path: str, sql: str, params: List[Any], fields: List[str],
+                 limit: int, response_format: str, chunk_size: int) -> Iterator[bytes]:
+    """
+    Encode query results chunk by chunk in the requested format.
+
+    ndjson ends with a {"next_cursor", "count"} line and binary with an 'end'
+    record carrying the same; next_cursor is null once the results run out.
+    CSV has no trailer, so clients build the cursor from the last row.
+    """
+    count = 0
+    last_row: Optional[Dict[str, Any]] = None
+
+    if response_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        yield buffer.getvalue().encode('utf-8')
+
+    for rows in iter_rows(db_path, sql, params, fields, chunk_size):
+        count += len(rows)
+        last_row = rows[-1]
+        if response_format == 'ndjson':
+            yield b''.join(json.dumps(row, separators=(',', ':')).encode('utf-8') + b'\n' for row in rows)
+        elif response_format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerows([row[field] for field in fields] for row in rows)
+            yield buffer.getvalue().encode('utf-8')
+        else:
+            yield encode_stream_record('fires', {'fires': rows, 'timestamp': rows[0]['datetime_utc']}, 'binary')
+
+    trailer = {
+        'next_cursor': make_cursor(last_row) if last_row and count == limit else None,
+        'count': count
+    }
+    if response_format == 'ndjson':
+        yield json.dumps(trailer).encode('utf-8') + b'\n'
+    elif response_format == 'binary':
+        yield encode_stream_record('end', trailer, 'binary')
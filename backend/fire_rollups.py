@@ -0,0 +1,245 @@
+"""
+Precomputed spatiotemporal rollups of fire_events.
+fire_rollup_hourly and fire_rollup_daily hold event counts and FRP sums per
+time bucket, grid cell, confidence and instrument; fire_rollup_cumulative
+holds a running total per hour, so a range count is two prefix lookups plus
+the partial hours at its edges. Rollups are refreshed incrementally from the
+last event id they include, so aggregates never rescan fire_events.
+"""
+
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+# Edge of a rollup grid cell in degrees (cells are indexed from -90/-180)
+ROLLUP_CELL_DEGREES = 0.5
+
+# Bucket -> (table, length of the datetime_utc prefix used as the bucket key)
+ROLLUP_TABLES = {
+    'hour': ('fire_rollup_hourly', 13),
+    'day': ('fire_rollup_daily', 10)
+}
+CUMULATIVE_TABLE = 'fire_rollup_cumulative'
+STATE_TABLE = 'fire_rollup_state'
+
+# Dimensions a rollup query can be grouped by
+GROUP_FIELDS = ['confidence', 'instrument', 'cell']
+
+
+def create_rollups(conn: sqlite3.Connection):
+    """Create the (empty) rollup tables if they do not exist."""
+    for table, _ in ROLLUP_TABLES.values():
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT NOT NULL,
+                cell_row INTEGER NOT NULL,
+                cell_col INTEGER NOT NULL,
+                confidence TEXT NOT NULL,
+                instrument TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                frp_sum REAL NOT NULL,
+                PRIMARY KEY (bucket, cell_row, cell_col, confidence, instrument)
+            ) WITHOUT ROWID
+        """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CUMULATIVE_TABLE} (
+            hour TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            cumulative INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (key TEXT PRIMARY KEY, value)")
+    # A new state table starts a new load generation: ids restart at 1 after a
+    # rebuild, so last_id alone can repeat a version that served other data
+    conn.execute(f"INSERT OR IGNORE INTO {STATE_TABLE} (key, value) VALUES ('generation', ?)",
+                 (time.time_ns(),))
+
+
+def drop_rollups(conn: sqlite3.Connection):
+    """Drop every rollup table (when fire_events is rebuilt)."""
+    for table, _ in ROLLUP_TABLES.values():
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.execute(f"DROP TABLE IF EXISTS {CUMULATIVE_TABLE}")
+    conn.execute(f"DROP TABLE IF EXISTS {STATE_TABLE}")
+
+
+def get_state(conn: sqlite3.Connection, key: str, default: Any = None) -> Any:
+    """Read a value from the rollup state table."""
+    row = conn.execute(f"SELECT value FROM {STATE_TABLE} WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_state(conn: sqlite3.Connection, key: str, value: Any):
+    """Write a value to the rollup state table."""
+    conn.execute(f"INSERT OR REPLACE INTO {STATE_TABLE} (key, value) VALUES (?, ?)", (key, value))
+
+
+def data_version(conn: sqlite3.Connection) -> str:
+    """Version of the loaded events: load generation and high-water event id."""
+    return f"{get_state(conn, 'generation', 0)}-{get_state(conn, 'last_id', 0)}"
+
+
+def refresh_rollups(conn: sqlite3.Connection) -> int:
+    """
+    Fold the events added since the last refresh into the rollups.
+
+    New events are grouped and upserted into the hourly and daily tables;
+    the cumulative totals are rebuilt only from the earliest hour touched.
+    Returns the number of events added (the caller commits).
+    """
+    create_rollups(conn)
+    if get_state(conn, 'cell_degrees', ROLLUP_CELL_DEGREES) != ROLLUP_CELL_DEGREES:
+        # Grid changed: rebuild from scratch
+        drop_rollups(conn)
+        create_rollups(conn)
+    last_id = get_state(conn, 'last_id', 0)
+
+    max_id, added, first_hour = conn.execute("""
+        SELECT MAX(id), COUNT(*), MIN(substr(datetime_utc, 1, 13))
+        FROM fire_events WHERE id > ?
+    """, (last_id,)).fetchone()
+    if not added:
+        return 0
+
+    for table, key_length in ROLLUP_TABLES.values():
+        conn.execute(f"""
+            INSERT INTO {table} (bucket, cell_row, cell_col, confidence, instrument, count, frp_sum)
+            SELECT substr(datetime_utc, 1, ?),
+                   CAST((latitude + 90) / ? AS INTEGER),
+                   CAST((longitude + 180) / ? AS INTEGER),
+                   COALESCE(confidence, ''), COALESCE(instrument, ''),
+                   COUNT(*), TOTAL(frp)
+            FROM fire_events WHERE id > ?
+            GROUP BY 1, 2, 3, 4, 5
+            ON CONFLICT (bucket, cell_row, cell_col, confidence, instrument) DO UPDATE SET
+                count = count + excluded.count,
+                frp_sum = frp_sum + excluded.frp_sum
+        """, (key_length, ROLLUP_CELL_DEGREES, ROLLUP_CELL_DEGREES, last_id))
+
+    hourly_table = ROLLUP_TABLES['hour'][0]
+    base = conn.execute(f"""
+        SELECT cumulative FROM {CUMULATIVE_TABLE} WHERE hour < ? ORDER BY hour DESC LIMIT 1
+    """, (first_hour,)).fetchone()
+    conn.execute(f"DELETE FROM {CUMULATIVE_TABLE} WHERE hour >= ?", (first_hour,))
+    conn.execute(f"""
+        INSERT INTO {CUMULATIVE_TABLE} (hour, count, cumulative)
+        SELECT bucket, SUM(count), ? + SUM(SUM(count)) OVER (ORDER BY bucket)
+        FROM {hourly_table} WHERE bucket >= ? GROUP BY bucket
+    """, (base[0] if base else 0, first_hour))
+
+    set_state(conn, 'last_id', max_id)
+    set_state(conn, 'cell_degrees', ROLLUP_CELL_DEGREES)
+    return added
+
+
+def ensure_rollups(db_path: str) -> int:
+    """Create or catch up the rollups of an existing database; returns events added."""
+    conn = sqlite3.connect(db_path)
+    try:
+        added = refresh_rollups(conn)
+        conn.commit()
+        return added
+    finally:
+        conn.close()
+
+
+def prefix_count(conn: sqlite3.Connection, hour: str) -> int:
+    """Events up to and including hour ('YYYY-MM-DD HH')."""
+    row = conn.execute(f"""
+        SELECT cumulative FROM {CUMULATIVE_TABLE} WHERE hour <= ? ORDER BY hour DESC LIMIT 1
+    """, (hour,)).fetchone()
+    return row[0] if row else 0
+
+
+def total_count(conn: sqlite3.Connection) -> int:
+    """Number of events in the rollups."""
+    row = conn.execute(f"SELECT cumulative FROM {CUMULATIVE_TABLE} ORDER BY hour DESC LIMIT 1").fetchone()
+    return row[0] if row else 0
+
+
+def count_range(conn: sqlite3.Connection, start_dt: Optional[datetime] = None,
+                end_dt: Optional[datetime] = None) -> int:
+    """
+    Exact count of events with start_dt <= datetime_utc <= end_dt (open ends allowed).
+
+    Whole hours come from the cumulative totals; only the partial hours at
+    either end are counted on fire_events (a short idx_datetime range).
+    """
+    count = total_count(conn)
+    if end_dt:
+        # Exclusive end of the whole hours, then the partial hour after it
+        last_full = (end_dt + timedelta(seconds=1)).replace(minute=0, second=0, microsecond=0)
+        count = prefix_count(conn, (last_full - timedelta(hours=1)).strftime('%Y-%m-%d %H'))
+        count += count_events(conn, last_full, end_dt)
+    if start_dt:
+        first_full = start_dt.replace(minute=0, second=0, microsecond=0)
+        if first_full < start_dt:
+            first_full += timedelta(hours=1)
+        if end_dt and first_full > end_dt:
+            return count_events(conn, start_dt, end_dt)
+        count -= prefix_count(conn, (first_full - timedelta(hours=1)).strftime('%Y-%m-%d %H'))
+        count += count_events(conn, start_dt, first_full - timedelta(seconds=1))
+    return count
+
+
+def count_events(conn: sqlite3.Connection, start_dt: datetime, end_dt: datetime) -> int:
+    """Count fire_events rows with start_dt <= datetime_utc <= end_dt (for short ranges)."""
+    if start_dt > end_dt:
+        return 0
+    return conn.execute("""
+        SELECT COUNT(*) FROM fire_events WHERE datetime_utc >= ? AND datetime_utc <= ?
+    """, (start_dt.strftime('%Y-%m-%d %H:%M:%S'), end_dt.strftime('%Y-%m-%d %H:%M:%S'))).fetchone()[0]
+
+
+def query_rollup(conn: sqlite3.Connection, bucket: Optional[str], group_by: List[str],
+                 start_dt: Optional[datetime] = None,
+                 end_dt: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Counts per time bucket ('hour', 'day' or None for the whole range) and group fields.
+
+    Buckets are whole: a range starting mid-day includes that whole day in
+    daily buckets. Cells are reported by their south-west corner.
+    """
+    table, key_length = ROLLUP_TABLES[bucket or 'day']
+    columns = []
+    if bucket:
+        columns.append('bucket')
+    for field in group_by:
+        if field not in GROUP_FIELDS:
+            raise ValueError(f"Unknown group_by field: {field}")
+        columns += ['cell_row', 'cell_col'] if field == 'cell' else [field]
+
+    conditions = []
+    params: List[Any] = []
+    if start_dt:
+        conditions.append("bucket >= ?")
+        params.append(start_dt.strftime('%Y-%m-%d %H:%M:%S')[:key_length])
+    if end_dt:
+        conditions.append("bucket <= ?")
+        params.append(end_dt.strftime('%Y-%m-%d %H:%M:%S')[:key_length])
+
+    select = ', '.join(columns + ['SUM(count)', 'SUM(frp_sum)'])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    group = f"GROUP BY {', '.join(columns)} ORDER BY {', '.join(columns)}" if columns else ""
+    cursor = conn.execute(f"SELECT {select} FROM {table} {where} {group}", params)
+
+    results = []
+    for row in cursor:
+        values = dict(zip(columns, row))
+        count, frp_sum = row[-2], row[-1]
+        if count is None:
+            continue
+        result = {}
+        if bucket:
+            result[bucket] = values['bucket']
+        for field in group_by:
+            if field == 'cell':
+                result['south'] = round(values['cell_row'] * ROLLUP_CELL_DEGREES - 90, 6)
+                result['west'] = round(values['cell_col'] * ROLLUP_CELL_DEGREES - 180, 6)
+            else:
+                result[field] = values[field]
+        result['count'] = count
+        result['mean_frp'] = round(frp_sum / count, 2) if count else None
+        results.append(result)
+    return results
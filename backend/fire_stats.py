@@ -0,0 +1,139 @@
+"""
+Incremental fire statistics for playback sessions.
+Each record adds to O(1) counters and a log-bucketed FRP quantile sketch.
+Rolling windows of simulated time keep hourly buckets in ring buffers, so
+hours leaving a window are subtracted from its totals instead of rescanned.
+"""
+
+import math
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Any
+
+# Categorical record fields broken down in the summaries
+CATEGORY_FIELDS = ['confidence', 'satellite', 'daynight']
+
+
+class RollingFireStatistics:
+    """Cumulative and rolling-window statistics over the records a session emitted."""
+
+    def __init__(self, windows: Dict[str, int], relative_accuracy: float,
+                 quantiles: List[float]):
+        """
+        Initialize with windows (name -> hours of simulated time), the FRP
+        sketch's relative accuracy and the FRP quantiles to report.
+        """
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.quantiles = quantiles
+
+        self.totals = Counter()
+        self.window_hours = windows
+        self.windows: Dict[str, Counter] = {name: Counter() for name in windows}
+        # Per window: (hour key, bucket counter) in time order
+        self.buckets: Dict[str, deque] = {name: deque() for name in windows}
+        self.hour = None
+        self.bucket = None
+
+    def reset_windows(self):
+        """Empty the rolling windows (after a seek); cumulative totals are kept."""
+        for name in self.windows:
+            self.windows[name].clear()
+            self.buckets[name].clear()
+        self.hour = None
+        self.bucket = None
+
+    def tally(self, record: Dict[str, Any], counts: Counter):
+        """Add one record's counters and FRP sketch bin to counts."""
+        counts['count'] += 1
+        for field in CATEGORY_FIELDS:
+            value = record.get(field)
+            if value is not None:
+                counts[(field, value)] += 1
+        frp = record.get('frp')
+        if frp is not None:
+            counts['frp_count'] += 1
+            counts['frp_sum'] += frp
+            if frp > 0:
+                counts[('frp', math.ceil(math.log(frp) / self.log_gamma))] += 1
+            else:
+                counts['frp_zero'] += 1
+
+    def flush(self, counts: Counter):
+        """Add a tally for the current hour to its bucket, the totals and every window."""
+        if not counts:
+            return
+        self.bucket.update(counts)
+        self.totals.update(counts)
+        for window in self.windows.values():
+            window.update(counts)
+
+    def start_bucket(self, hour: str):
+        """Open the bucket for a new hour in every window's ring buffer."""
+        self.hour = hour
+        self.bucket = Counter()
+        for name in self.windows:
+            self.buckets[name].append((hour, self.bucket))
+
+    def add_records(self, records: List[Dict[str, Any]]):
+        """Update all counters with a batch of time-ordered records."""
+        counts = Counter()
+        for record in records:
+            hour = record['datetime_utc'][:13]
+            if self.hour is None or hour > self.hour:
+                self.flush(counts)
+                counts = Counter()
+                self.start_bucket(hour)
+            self.tally(record, counts)
+        self.flush(counts)
+
+    def advance(self, now: datetime):
+        """Subtract the hourly buckets that fell out of each window at simulated time now."""
+        for name, hours in self.window_hours.items():
+            cutoff = (now - timedelta(hours=hours)).strftime('%Y-%m-%d %H')
+            buckets = self.buckets[name]
+            while buckets and buckets[0][0] <= cutoff:
+                _, bucket = buckets.popleft()
+                self.windows[name] -= bucket
+
+    def bin_value(self, index: int) -> float:
+        """Representative FRP of a sketch bin (within the relative accuracy)."""
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def summarize(self, counts: Counter) -> Dict[str, Any]:
+        """Summary of one counter set: count, FRP mean/max/quantiles and category breakdowns."""
+        summary: Dict[str, Any] = {'count': counts['count']}
+        for field in CATEGORY_FIELDS:
+            summary[field] = {key[1]: value for key, value in counts.items()
+                              if isinstance(key, tuple) and key[0] == field and value > 0}
+
+        frp_count = counts['frp_count']
+        summary['mean_frp'] = round(counts['frp_sum'] / frp_count, 2) if frp_count else None
+
+        bins = sorted((key[1], value) for key, value in counts.items()
+                      if isinstance(key, tuple) and key[0] == 'frp' and value > 0)
+        summary['max_frp'] = round(self.bin_value(bins[-1][0]), 2) if bins else None
+        for q in self.quantiles:
+            summary[f"frp_p{round(q * 100)}"] = self.quantile(q, counts['frp_zero'], bins, frp_count)
+        return summary
+
+    def quantile(self, q: float, zeros: int, bins: List[tuple], count: int):
+        """Approximate FRP quantile from sorted sketch bins."""
+        if not count:
+            return None
+        rank = q * (count - 1)
+        seen = zeros
+        if rank < seen:
+            return 0.0
+        for index, value in bins:
+            seen += value
+            if rank < seen:
+                return round(self.bin_value(index), 2)
+        return round(self.bin_value(bins[-1][0]), 2) if bins else 0.0
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Summaries of the cumulative totals and every rolling window."""
+        summary = {'total': self.summarize(self.totals)}
+        for name, counts in self.windows.items():
+            summary[name] = self.summarize(counts)
+        return summary
@@ -0,0 +1,106 @@
+"""
+Fire-point vector tiles for the /fires/{z}/{x}/{y} endpoint.
+A tile holds the detections inside one XYZ tile for a time window, or at
+low zooms and in dense tiles, grid clusters from fire_index.bin_clusters
+(the playback aggregation). Tiles are encoded as GeoJSON or as one binary
+stream record with the columnar fire frame layout.
+"""
+
+import json
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+from fire_index import bin_clusters
+from heat_tiles import project, TILE_SIZE
+from wire_format import encode_stream_record
+
+# Tile encodings and their content types
+FIRE_TILE_FORMATS = {
+    'geojson': 'application/geo+json',
+    'binary': 'application/octet-stream'
+}
+
+
+def cluster_points(points: List[Dict[str, Any]], z: int, grid_size: int) -> List[Dict[str, Any]]:
+    """Bin a tile's point dicts into grid_size x grid_size cells per tile (see bin_clusters)."""
+    if not points:
+        return []
+    labels, codes = np.unique([str(point.get('confidence')) for point in points], return_inverse=True)
+    return bin_clusters(np.array([point['latitude'] for point in points], dtype=np.float64),
+                        np.array([point['longitude'] for point in points], dtype=np.float64),
+                        np.array([point.get('frp') or 0.0 for point in points], dtype=np.float64),
+                        codes, labels, z, grid_size)
+
+
+def encode_geojson(tile: Dict[str, Any]) -> bytes:
+    """GeoJSON FeatureCollection of a tile's fires or clusters; tile metadata goes in 'properties'."""
+    features = []
+    for fire in tile['fires']:
+        properties = {key: value for key, value in fire.items() if key not in ('latitude', 'longitude')}
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [fire['longitude'], fire['latitude']]},
+            'properties': properties
+        })
+    for cluster in tile['clusters']:
+        properties = {key: value for key, value in cluster.items() if key not in ('latitude', 'longitude')}
+        properties['cluster'] = True
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [cluster['longitude'], cluster['latitude']]},
+            'properties': properties
+        })
+    metadata = {key: value for key, value in tile.items() if key not in ('fires', 'clusters')}
+    return json.dumps({'type': 'FeatureCollection', 'properties': metadata, 'features': features},
+                      separators=(',', ':')).encode('utf-8')
+
+
+def encode_tile(tile: Dict[str, Any], tile_format: str) -> bytes:
+    """
+    Encode a tile dict ({'tile', 'window', 'count', 'fires', 'clusters'}).
+
+    binary is a single 'fire_tile' stream record (see encode_stream_record):
+    fires are packed columns relative to 'timestamp', clusters stay JSON.
+    """
+    if tile_format == 'geojson':
+        return encode_geojson(tile)
+    return encode_stream_record('fire_tile', tile, 'binary')
+
+
+def in_tile(rows: List[Dict[str, Any]], z: int, x: int, y: int) -> List[Dict[str, Any]]:
+    """Rows whose projected pixel lies in tile (z, x, y), so edge points belong to one tile."""
+    if not rows:
+        return rows
+    px, py = project(np.array([row['latitude'] for row in rows], dtype=np.float64),
+                     np.array([row['longitude'] for row in rows], dtype=np.float64), z)
+    inside = ((np.floor(px / TILE_SIZE) == x) & (np.floor(py / TILE_SIZE) == y)).tolist()
+    return [row for row, keep in zip(rows, inside) if keep]
+
+
+def make_tile(z: int, x: int, y: int, window: List[Optional[str]], count: int,
+              fires: List[Dict[str, Any]], clusters: List[Dict[str, Any]],
+              aggregated: bool, truncated: bool = False) -> Dict[str, Any]:
+    """
+    Tile dict with either fires or clusters. truncated marks a clustered tile
+    built from only the first rows of a window with more events.
+    """
+    return {
+        'tile': [z, x, y],
+        'window': window,
+        'count': count,
+        'aggregated': aggregated,
+        'truncated': truncated,
+        'timestamp': window[0] or (fires[0]['datetime_utc'] if fires else '1970-01-01 00:00:00'),
+        'fires': fires,
+        'clusters': clusters
+    }
+
+
+def build_tile(z: int, x: int, y: int, window: List[Optional[str]], rows: List[Dict[str, Any]],
+               aggregate: bool, grid_size: int, truncated: bool = False) -> Dict[str, Any]:
+    """Tile dict from the rows read for its bounds, clustered when aggregate is set."""
+    rows = in_tile(rows, z, x, y)
+    if aggregate:
+        return make_tile(z, x, y, window, len(rows), [], cluster_points(rows, z, grid_size), True, truncated)
+    return make_tile(z, x, y, window, len(rows), rows, [], False)
@@ -0,0 +1,129 @@
+"""
+Server-rendered fire density heatmap tiles.
+Fire events inside a tile (plus a blur margin) are binned onto a pixel grid
+with NumPy, smoothed with a separable Gaussian kernel, colored through a
+lookup table and written as RGBA PNG using only zlib.
+"""
+
+import struct
+import zlib
+from typing import Tuple
+
+import numpy as np
+
+from fire_index import mercator_xy
+from tile_math import tile_to_lat_lon
+
+TILE_SIZE = 256
+
+# Color ramp stops: (intensity 0-1, (r, g, b, a))
+COLOR_STOPS = [
+    (0.0, (255, 255, 178, 0)),
+    (0.25, (254, 204, 92, 150)),
+    (0.5, (253, 141, 60, 190)),
+    (0.75, (240, 59, 32, 220)),
+    (1.0, (189, 0, 38, 240))
+]
+
+
+def build_color_table() -> np.ndarray:
+    """256-entry RGBA lookup table interpolated from COLOR_STOPS."""
+    positions = np.linspace(0.0, 1.0, 256)
+    stops = [stop for stop, _ in COLOR_STOPS]
+    channels = [np.interp(positions, stops, [color[i] for _, color in COLOR_STOPS]) for i in range(4)]
+    return np.stack(channels, axis=1).round().astype(np.uint8)
+
+
+COLOR_TABLE = build_color_table()
+
+
+def tile_bounds(z: int, x: int, y: int, margin_px: int = 0) -> Tuple[float, float, float, float]:
+    """(south, north, west, east) of a tile widened by margin_px pixels on each side."""
+    margin = margin_px / TILE_SIZE
+    north, west = tile_to_lat_lon(x - margin, y - margin, z)
+    south, east = tile_to_lat_lon(x + 1 + margin, y + 1 + margin, z)
+    return south, north, west, east
+
+
+def project(latitudes: np.ndarray, longitudes: np.ndarray, z: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized Web Mercator projection to global pixel coordinates at zoom z."""
+    return mercator_xy(latitudes, longitudes, TILE_SIZE * 2.0 ** z)
+
+
+def gaussian_kernel(radius: int) -> np.ndarray:
+    """Normalized 1-D Gaussian covering +-radius pixels."""
+    offsets = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (offsets / max(radius / 2.0, 0.5)) ** 2)
+    return kernel / kernel.sum()
+
+
+def blur(grid: np.ndarray, radius: int) -> np.ndarray:
+    """Separable Gaussian blur as a weighted sum of shifted slices (rows, then columns)."""
+    if radius <= 0:
+        return grid
+    kernel = gaussian_kernel(radius)
+    size = len(kernel)
+    rows = sum(weight * grid[:, i:grid.shape[1] - size + 1 + i] for i, weight in enumerate(kernel))
+    return sum(weight * rows[i:rows.shape[0] - size + 1 + i, :] for i, weight in enumerate(kernel))
+
+
+def heat_grid(radius: int) -> np.ndarray:
+    """Empty weight grid for one tile plus a radius margin on each side."""
+    side = TILE_SIZE + 2 * radius
+    return np.zeros((side, side))
+
+
+def bin_points(grid: np.ndarray, latitudes: np.ndarray, longitudes: np.ndarray, weights: np.ndarray,
+               z: int, x: int, y: int, radius: int):
+    """
+    Add weighted points to the heat_grid of tile (z, x, y) with one bincount.
+
+    The grid includes a radius margin, so blur near the tile edge matches
+    the neighbouring tiles. Points outside it are ignored, so the grid can
+    be filled chunk by chunk.
+    """
+    side = grid.shape[0]
+    px, py = project(latitudes, longitudes, z)
+    col = np.floor(px - x * TILE_SIZE + radius).astype(np.int64)
+    row = np.floor(py - y * TILE_SIZE + radius).astype(np.int64)
+    inside = (col >= 0) & (col < side) & (row >= 0) & (row < side)
+    grid += np.bincount(row[inside] * side + col[inside], weights=weights[inside],
+                        minlength=side * side).reshape(side, side)
+
+
+def shade_heatmap(grid: np.ndarray, radius: int, saturation: float) -> np.ndarray:
+    """
+    Blur and color a filled heat_grid into a (256, 256, 4) RGBA array.
+
+    Density is log-scaled against saturation (the blurred weight per pixel
+    that maps to the top of the color ramp).
+    """
+    density = blur(grid, radius)
+    intensity = np.log1p(density) / np.log1p(saturation)
+    index = np.clip(intensity * 255, 0, 255).astype(np.uint8)
+    return COLOR_TABLE[index]
+
+
+def render_heatmap(latitudes: np.ndarray, longitudes: np.ndarray, weights: np.ndarray,
+                   z: int, x: int, y: int, radius: int, saturation: float) -> np.ndarray:
+    """Rasterize weighted points onto tile (z, x, y) as a (256, 256, 4) RGBA array."""
+    grid = heat_grid(radius)
+    bin_points(grid, latitudes, longitudes, weights, z, x, y, radius)
+    return shade_heatmap(grid, radius, saturation)
+
+
+def png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """One length-prefixed, CRC-terminated PNG chunk."""
+    return (struct.pack('>I', len(data)) + chunk_type + data
+            + struct.pack('>I', zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
+
+
+def encode_png(rgba: np.ndarray, compression: int = 6) -> bytes:
+    """Encode an (h, w, 4) uint8 array as an 8-bit RGBA PNG (filter type 0 on every row)."""
+    height, width, _ = rgba.shape
+    scanlines = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = rgba.reshape(height, width * 4)
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', header)
+            + png_chunk(b'IDAT', zlib.compress(scanlines.tobytes(), compression))
+            + png_chunk(b'IEND', b''))
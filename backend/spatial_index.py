@@ -0,0 +1,103 @@
+"""
+SQLite R*Tree spatial index over fire_events.
+fire_events_rtree holds one point box per event (latitude, longitude and
+time), keyed by event id, so bbox and bbox+time queries prune on all three
+axes before any table rows are read.
+"""
+
+import math
+import sqlite3
+from datetime import datetime
+from typing import List, Any, Optional, Tuple
+
+RTREE_TABLE = 'fire_events_rtree'
+
+# Time axis unit. R*Tree splits compare extents across axes, so time is kept
+# on a scale similar to degrees: in seconds the tree degenerates into time
+# slabs and bbox-only queries visit most of it (weeks benchmarked best).
+RTREE_TIME_UNIT_SECONDS = 7 * 86400
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def create_spatial_index(conn: sqlite3.Connection):
+    """Create the (empty) R*Tree table if it does not exist."""
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE_TABLE} USING rtree(
+            id, min_lat, max_lat, min_lon, max_lon, min_time, max_time
+        )
+    """)
+
+
+def populate_spatial_index(conn: sqlite3.Connection, after_id: int = 0) -> int:
+    """Index the events with id > after_id; returns the number of rows added."""
+    cursor = conn.execute(f"""
+        INSERT INTO {RTREE_TABLE}
+        SELECT id, latitude, latitude, longitude, longitude, time_key, time_key
+        FROM (SELECT id, latitude, longitude,
+                     (julianday(datetime_utc) - 2440587.5) * 86400.0 / ? AS time_key
+              FROM fire_events WHERE id > ? ORDER BY id)
+    """, (RTREE_TIME_UNIT_SECONDS, after_id))
+    return cursor.rowcount
+
+
+def ensure_spatial_index(db_path: str) -> int:
+    """Create or catch up the R*Tree of an existing database; returns rows added."""
+    conn = sqlite3.connect(db_path)
+    try:
+        create_spatial_index(conn)
+        indexed_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {RTREE_TABLE}").fetchone()[0]
+        added = populate_spatial_index(conn, indexed_id)
+        conn.commit()
+        return added
+    finally:
+        conn.close()
+
+
+def time_key(value: datetime) -> float:
+    """Naive UTC datetime to the R*Tree time axis (RTREE_TIME_UNIT_SECONDS since the epoch)."""
+    return (value - datetime(1970, 1, 1)).total_seconds() / RTREE_TIME_UNIT_SECONDS
+
+
+def bbox_condition(south: float, north: float, west: float, east: float,
+                   start_dt: Optional[datetime] = None,
+                   end_dt: Optional[datetime] = None) -> Tuple[str, List[Any]]:
+    """
+    SQL condition limiting fire_events.id to a box (and time range) via the R*Tree.
+
+    R*Tree coordinates are 32-bit floats rounded outward, so this is an overlap
+    test that may admit a few events just outside the box; callers keep their
+    exact latitude/longitude/datetime predicates alongside it.
+    """
+    conditions = ["max_lat >= ?", "min_lat <= ?", "max_lon >= ?", "min_lon <= ?"]
+    params: List[Any] = [south, north, west, east]
+    if start_dt:
+        conditions.append("max_time >= ?")
+        params.append(time_key(start_dt))
+    if end_dt:
+        conditions.append("min_time <= ?")
+        params.append(time_key(end_dt))
+    return f"id IN (SELECT id FROM {RTREE_TABLE} WHERE {' AND '.join(conditions)})", params
+
+
+def radius_bbox(latitude: float, longitude: float,
+                radius_km: float) -> Tuple[float, float, float, float]:
+    """(south, north, west, east) box enclosing a circle, used to prefilter radius queries."""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    dlon = dlat / max(math.cos(math.radians(min(abs(latitude) + dlat, 89.9))), 1e-6)
+    return latitude - dlat, latitude + dlat, longitude - dlon, longitude + dlon
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance in km; registered as an SQL function for radius queries."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def register_functions(conn: sqlite3.Connection):
+    """Make distance_km() available to queries on conn."""
+    conn.create_function('distance_km', 4, distance_km, deterministic=True)
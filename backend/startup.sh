@@ -58,6 +58,12 @@ else
     echo "Map tiles already exist."
 fi
 
+# Serve tiles from one MBTiles file; pack an existing tile directory into it once
+if [ ! -f "/app/map_tiles/tiles.mbtiles" ]; then
+    echo "Packing map tiles into map_tiles/tiles.mbtiles..."
+    python download_tiles.py --pack
+fi
+
 # Verify the application can start
 echo "Verifying application files..."
 python -c "import app" 2>/dev/null
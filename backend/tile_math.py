@@ -0,0 +1,44 @@
+"""
+Web Mercator (XYZ) tile math shared by the tile downloader and the tile endpoints.
+"""
+
+import math
+from typing import Tuple
+
+
+def lat_lon_to_tile(lat: float, lon: float, zoom: int) -> Tuple[int, int]:
+    """
+    Convert latitude/longitude to tile numbers for given zoom level.
+    
+    Args:
+        lat: Latitude in decimal degrees
+        lon: Longitude in decimal degrees  
+        zoom: Zoom level
+        
+    Returns:
+        Tuple of (x, y) tile coordinates
+    """
+    lat_rad = math.radians(lat)
+    n = 2.0 ** zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return x, y
+
+
+def tile_to_lat_lon(x: int, y: int, zoom: int) -> Tuple[float, float]:
+    """
+    Convert tile coordinates to latitude/longitude.
+    
+    Args:
+        x: Tile X coordinate
+        y: Tile Y coordinate
+        zoom: Zoom level
+        
+    Returns:
+        Tuple of (lat, lon) in decimal degrees
+    """
+    n = 2.0 ** zoom
+    lon_deg = x / n * 360.0 - 180.0
+    lat_rad = math.atan(math.sinh(math.pi * (1 - 2 * y / n)))
+    lat_deg = math.degrees(lat_rad)
+    return lat_deg, lon_deg
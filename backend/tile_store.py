@@ -0,0 +1,461 @@
+"""
+Base map tile storage.
+MBTilesStore keeps every tile in one SQLite file (MBTiles 1.3 schema), read
+through a pool of read-only connections with SQLite memory-mapped I/O, so a
+tile hit is an index lookup on mapped pages rather than a path walk and
+file open. DirectoryTileStore is the original {z}/{x}/{y}.png layout, kept
+as a fallback and as the source for packing into MBTiles. TileCache is the
+in-process LRU in front of the stores and the rendered tile endpoints.
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from queue import LifoQueue, Empty
+from typing import Dict, Iterator, Optional, Tuple
+
+
+# Downloader manifest kept in the tile directory; rewritten whenever tiles are added
+DIRECTORY_MANIFEST = 'manifest.txt'
+
+
+class DirectoryTileStore:
+    """Tiles as {z}/{x}/{y}.png files under a directory."""
+
+    def __init__(self, directory: str):
+        """Initialize with the tile root directory."""
+        self.directory = directory
+        self.newest_tile: Optional[float] = None
+
+    def tile_path(self, z: int, x: int, y: int) -> str:
+        """File holding tile (z, x, y)."""
+        return os.path.join(self.directory, str(z), str(x), f"{y}.png")
+
+    def get_tile(self, z: int, x: int, y: int) -> Optional[bytes]:
+        """Tile bytes, or None if the tile is missing or empty."""
+        try:
+            with open(self.tile_path(z, x, y), 'rb') as f:
+                return f.read() or None
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    def has_tile(self, z: int, x: int, y: int) -> bool:
+        """Check whether a non-empty tile exists."""
+        path = self.tile_path(z, x, y)
+        return os.path.exists(path) and os.path.getsize(path) > 0
+
+    def put_tile(self, z: int, x: int, y: int, data: bytes):
+        """Write a tile (atomically, so readers never see a partial file)."""
+        path = self.tile_path(z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def iter_tiles(self, z: Optional[int] = None) -> Iterator[Tuple[int, int, int]]:
+        """(z, x, y) of every non-empty tile (at zoom z if given)."""
+        if not os.path.isdir(self.directory):
+            return
+        for z_name in os.listdir(self.directory):
+            z_path = os.path.join(self.directory, z_name)
+            if not (z_name.isdigit() and os.path.isdir(z_path)) or (z is not None and int(z_name) != z):
+                continue
+            for x_name in os.listdir(z_path):
+                x_path = os.path.join(z_path, x_name)
+                if not (x_name.isdigit() and os.path.isdir(x_path)):
+                    continue
+                for tile_name in os.listdir(x_path):
+                    y_name, extension = os.path.splitext(tile_name)
+                    if (extension == '.png' and y_name.isdigit()
+                            and os.path.getsize(os.path.join(x_path, tile_name)) > 0):
+                        yield int(z_name), int(x_name), int(y_name)
+
+    def count_tiles(self, z: int) -> int:
+        """Number of non-empty tiles at zoom z."""
+        return sum(1 for _ in self.iter_tiles(z))
+
+    def modified_time(self) -> float:
+        """
+        Version stamp of the tiles: the mtime of the downloader manifest, which
+        changes whenever tiles are (re)downloaded, or without one the newest
+        tile file's mtime (scanned once). The root's own mtime does not change
+        when files under {z}/{x}/ are replaced.
+        """
+        manifest = os.path.join(self.directory, DIRECTORY_MANIFEST)
+        try:
+            return os.path.getmtime(manifest)
+        except OSError:
+            pass
+        if self.newest_tile is None:
+            self.newest_tile = max((os.path.getmtime(self.tile_path(z, x, y)) for z, x, y in self.iter_tiles()),
+                                   default=0.0)
+        return self.newest_tile
+
+    def close(self):
+        """Nothing to release."""
+
+
+class MBTilesStore:
+    """
+    Tiles in a single MBTiles (SQLite) file.
+
+    Rows use the MBTiles TMS convention (tile_row counts from the south), so
+    the file opens in standard tools; the XYZ y of the API is flipped here.
+    Readers share a pool of read-only connections with mmap_size set, so
+    SQLite serves pages straight from a read-only memory map of the file.
+    """
+
+    def __init__(self, path: str, readonly: bool = True, mmap_size: int = 0,
+                 metadata: Optional[Dict[str, str]] = None, commit_every: int = 100):
+        """
+        Open path for reading (readonly) or create/open it for writing.
+
+        metadata is written to the metadata table when writing; writes are
+        committed every commit_every tiles and on flush()/close().
+        """
+        self.path = path
+        self.readonly = readonly
+        self.mmap_size = mmap_size
+        self.commit_every = commit_every
+        self.pool: LifoQueue = LifoQueue()
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.writer = None
+
+        if not readonly:
+            self.writer = sqlite3.connect(path, check_same_thread=False)
+            self.writer.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+            self.writer.execute("""
+                CREATE TABLE IF NOT EXISTS tiles (
+                    zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB
+                )
+            """)
+            self.writer.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row)
+            """)
+            if metadata:
+                self.writer.executemany("INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)",
+                                        list(metadata.items()))
+            self.writer.commit()
+
+    @staticmethod
+    def tms_row(z: int, y: int) -> int:
+        """XYZ y to MBTiles tile_row."""
+        return (1 << z) - 1 - y
+
+    def connect(self) -> sqlite3.Connection:
+        """New read-only connection with memory-mapped I/O."""
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        return conn
+
+    def read(self, sql: str, params: tuple) -> Optional[tuple]:
+        """Run one read query on a pooled connection (the writer when writable)."""
+        if self.writer:
+            with self.lock:
+                return self.writer.execute(sql, params).fetchone()
+        try:
+            conn = self.pool.get_nowait()
+        except Empty:
+            conn = self.connect()
+        try:
+            return conn.execute(sql, params).fetchone()
+        finally:
+            self.pool.put(conn)
+
+    def get_tile(self, z: int, x: int, y: int) -> Optional[bytes]:
+        """Tile bytes, or None if the tile is missing."""
+        row = self.read("""
+            SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?
+        """, (z, x, self.tms_row(z, y)))
+        return bytes(row[0]) if row and row[0] else None
+
+    def has_tile(self, z: int, x: int, y: int) -> bool:
+        """Check whether a non-empty tile exists."""
+        row = self.read("""
+            SELECT length(tile_data) FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?
+        """, (z, x, self.tms_row(z, y)))
+        return bool(row and row[0])
+
+    def put_tile(self, z: int, x: int, y: int, data: bytes):
+        """Insert or replace a tile (thread-safe; committed in batches)."""
+        with self.lock:
+            self.writer.execute("""
+                INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data)
+                VALUES (?, ?, ?, ?)
+            """, (z, x, self.tms_row(z, y), sqlite3.Binary(data)))
+            self.pending += 1
+            if self.pending >= self.commit_every:
+                self.writer.commit()
+                self.pending = 0
+
+    def set_metadata(self, name: str, value: str):
+        """Write one metadata entry."""
+        with self.lock:
+            self.writer.execute("INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)", (name, value))
+
+    def count_tiles(self, z: int) -> int:
+        """Number of non-empty tiles at zoom z."""
+        row = self.read("SELECT COUNT(*) FROM tiles WHERE zoom_level = ? AND length(tile_data) > 0", (z,))
+        return row[0] if row else 0
+
+    def iter_tiles(self, z: Optional[int] = None) -> Iterator[Tuple[int, int, int]]:
+        """(z, x, y) of every non-empty tile (at zoom z if given)."""
+        sql = "SELECT zoom_level, tile_column, tile_row FROM tiles WHERE length(tile_data) > 0"
+        params: tuple = ()
+        if z is not None:
+            sql += " AND zoom_level = ?"
+            params = (z,)
+        conn = self.writer or self.connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            if conn is not self.writer:
+                conn.close()
+        for zoom, x, row in rows:
+            yield zoom, x, self.tms_row(zoom, row)
+
+    def modified_time(self) -> float:
+        """Modification time of the MBTiles file."""
+        return os.path.getmtime(self.path)
+
+    def flush(self):
+        """Commit pending writes."""
+        if self.writer:
+            with self.lock:
+                self.writer.commit()
+                self.pending = 0
+
+    def close(self):
+        """Commit pending writes and close every connection."""
+        if self.writer:
+            self.flush()
+            self.writer.close()
+            self.writer = None
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except Empty:
+                break
+
+
+class TileCache:
+    """
+    LRU cache of encoded tiles in memory, backed by an optional disk directory.
+
+    Memory is bounded by entry count and total bytes. Known-missing keys can
+    be remembered as negative entries for a limited time, so repeated
+    requests for tiles that do not exist skip the store.
+
+    The disk tier keeps one subdirectory per data version (see set_version);
+    switching versions deletes the others, and files past max_disk_bytes
+    are pruned least recently used first.
+    """
+
+    def __init__(self, max_entries: int, directory: Optional[str] = None, extension: str = 'png',
+                 max_bytes: Optional[int] = None, negative_ttl: float = 0.0,
+                 max_disk_bytes: Optional[int] = None):
+        """
+        Initialize with the in-memory limits (entries, and bytes if given), the
+        disk cache directory (None = memory only), its file extension, how
+        long negative entries live in seconds (0 disables them) and the disk
+        byte limit (None = unbounded).
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.extension = extension
+        self.negative_ttl = negative_ttl
+        self.max_disk_bytes = max_disk_bytes
+        self.entries: OrderedDict = OrderedDict()
+        self.missing: OrderedDict = OrderedDict()
+        self.size_bytes = 0
+        self.disk_entries: OrderedDict = OrderedDict()
+        self.disk_bytes = 0
+        self.version = '0'
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.scan_disk()
+
+    def version_directory(self) -> str:
+        """Disk directory of the current data version."""
+        return os.path.join(self.directory, self.version)
+
+    def scan_disk(self):
+        """Index the current version's files by last use (mtime) and total their size."""
+        self.disk_entries.clear()
+        self.disk_bytes = 0
+        directory = self.version_directory()
+        if not os.path.isdir(directory):
+            return
+        files = []
+        for name in os.listdir(directory):
+            if name.endswith(f".{self.extension}"):
+                stat = os.stat(os.path.join(directory, name))
+                files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self.disk_entries[name] = size
+            self.disk_bytes += size
+
+    def set_version(self, version):
+        """
+        Switch to a data version (keys carry it too), deleting the disk files
+        and memory entries of every other version.
+        """
+        version = str(version)
+        with self.lock:
+            if version == self.version:
+                return
+            self.version = version
+            self.entries.clear()
+            self.missing.clear()
+            self.size_bytes = 0
+            if not self.directory:
+                return
+            for name in os.listdir(self.directory):
+                if name != version:
+                    path = os.path.join(self.directory, name)
+                    if os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        os.remove(path)
+            self.scan_disk()
+
+    @staticmethod
+    def make_etag(key: str) -> str:
+        """Strong validator for a cache key (keys include the data version)."""
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def disk_name(self, key: str) -> str:
+        """File name backing a cache key."""
+        return f"{self.make_etag(key)}.{self.extension}"
+
+    def disk_path(self, key: str) -> str:
+        """File backing a cache key (in the current version's directory)."""
+        return os.path.join(self.version_directory(), self.disk_name(key))
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Cached tile bytes for key, from memory or disk; None on a miss."""
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        if self.directory:
+            name = self.disk_name(key)
+            with self.lock:
+                on_disk = name in self.disk_entries
+                if on_disk:
+                    self.disk_entries.move_to_end(name)
+            if on_disk:
+                try:
+                    path = self.disk_path(key)
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                    os.utime(path)
+                except OSError:
+                    data = None
+                if data is not None:
+                    self.store(key, data)
+                    with self.lock:
+                        self.hits += 1
+                    return data
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def store(self, key: str, data: bytes):
+        """Insert into the memory LRU, evicting the least recently used entries past the limits."""
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= len(previous)
+            self.entries[key] = data
+            self.size_bytes += len(data)
+            self.missing.pop(key, None)
+            while len(self.entries) > self.max_entries or (
+                    self.max_bytes is not None and self.size_bytes > self.max_bytes and len(self.entries) > 1):
+                _, evicted = self.entries.popitem(last=False)
+                self.size_bytes -= len(evicted)
+
+    def put(self, key: str, data: bytes):
+        """Cache a rendered tile in memory and on disk (written atomically, then pruned)."""
+        self.store(key, data)
+        if not self.directory:
+            return
+        name = self.disk_name(key)
+        path = self.disk_path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            # The version directory was replaced meanwhile; the tile stays in memory
+            return
+        evicted = []
+        with self.lock:
+            if not path.startswith(self.version_directory() + os.sep):
+                return
+            self.disk_bytes += len(data) - self.disk_entries.pop(name, 0)
+            self.disk_entries[name] = len(data)
+            while (self.max_disk_bytes is not None and self.disk_bytes > self.max_disk_bytes
+                   and len(self.disk_entries) > 1):
+                evicted_name, size = self.disk_entries.popitem(last=False)
+                self.disk_bytes -= size
+                evicted.append(os.path.join(self.version_directory(), evicted_name))
+        for evicted_path in evicted:
+            try:
+                os.remove(evicted_path)
+            except OSError:
+                pass
+
+    def put_missing(self, key: str):
+        """Remember that key has no tile (for negative_ttl seconds)."""
+        if self.negative_ttl <= 0:
+            return
+        with self.lock:
+            self.missing[key] = time.monotonic() + self.negative_ttl
+            self.missing.move_to_end(key)
+            while len(self.missing) > self.max_entries:
+                self.missing.popitem(last=False)
+
+    def is_missing(self, key: str) -> bool:
+        """Check for a live negative entry."""
+        with self.lock:
+            expires = self.missing.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self.missing[key]
+                return False
+            self.negative_hits += 1
+            return True
+
+    def get_stats(self) -> dict:
+        """Entry, byte and hit/miss counts."""
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.size_bytes, 'hits': self.hits,
+                    'misses': self.misses, 'negative_entries': len(self.missing),
+                    'negative_hits': self.negative_hits, 'disk_entries': len(self.disk_entries),
+                    'disk_bytes': self.disk_bytes}
+
+
+def open_tile_store(directory: str, mbtiles_path: str, mmap_size: int = 0):
+    """Store to serve base map tiles from: the MBTiles file if present, else the directory."""
+    if os.path.isfile(mbtiles_path):
+        return MBTilesStore(mbtiles_path, readonly=True, mmap_size=mmap_size)
+    return DirectoryTileStore(directory)
@@ -0,0 +1,205 @@
+"""
+Base map tiles synthesized from neighbouring zoom levels.
+A tile missing from the store is cut from its nearest stored ancestor and
+upscaled (overzoom), or mosaicked from its four children and downsampled
+(underzoom). Tiles are decoded with NumPy and zlib only and re-encoded with
+heat_tiles.encode_png.
+"""
+
+import struct
+import zlib
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from heat_tiles import encode_png
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Samples per pixel for each PNG color type
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def read_chunks(data: bytes) -> Iterator[Tuple[bytes, bytes]]:
+    """(type, body) of each PNG chunk, CRCs not checked."""
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("not a PNG")
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        yield chunk_type, data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+
+
+def paeth(left: int, up: int, up_left: int) -> int:
+    """PNG Paeth predictor."""
+    estimate = left + up - up_left
+    distance_left, distance_up, distance_up_left = abs(estimate - left), abs(estimate - up), abs(estimate - up_left)
+    if distance_left <= distance_up and distance_left <= distance_up_left:
+        return left
+    return up if distance_up <= distance_up_left else up_left
+
+
+def unfilter(raw: bytes, height: int, stride: int, bpp: int) -> np.ndarray:
+    """
+    Reverse the per-row PNG filters into a (height, stride) byte array.
+
+    None, Sub and Up are vectorized per row; Average and Paeth depend on the
+    reconstructed byte to the left and run as plain Python loops.
+    """
+    rows = np.frombuffer(raw, dtype=np.uint8)[:height * (stride + 1)].reshape(height, stride + 1)
+    out = np.empty((height, stride), dtype=np.uint8)
+    previous = np.zeros(stride, dtype=np.int64)
+    for r in range(height):
+        filter_type = rows[r, 0]
+        line = rows[r, 1:].astype(np.int64)
+        if filter_type == 0:
+            current = line
+        elif filter_type == 1:
+            current = np.cumsum(line.reshape(-1, bpp), axis=0).ravel() % 256
+        elif filter_type == 2:
+            current = (line + previous) % 256
+        elif filter_type in (3, 4):
+            values, above = line.tolist(), previous.tolist()
+            for i in range(stride):
+                left = values[i - bpp] if i >= bpp else 0
+                if filter_type == 3:
+                    predicted = (left + above[i]) // 2
+                else:
+                    predicted = paeth(left, above[i], above[i - bpp] if i >= bpp else 0)
+                values[i] = (values[i] + predicted) % 256
+            current = np.array(values, dtype=np.int64)
+        else:
+            raise ValueError(f"unknown PNG filter {filter_type}")
+        out[r] = current
+        previous = current
+    return out
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    """
+    Decode a non-interlaced PNG into an (h, w, 4) uint8 RGBA array.
+
+    Handles every color type at 8 bits, palette and grayscale at 1/2/4 bits
+    (what tile servers emit) and 16-bit samples by keeping the high byte.
+    Raises ValueError for anything else.
+    """
+    header, palette, transparency, idat = None, None, None, []
+    for chunk_type, body in read_chunks(data):
+        if chunk_type == b'IHDR':
+            header = struct.unpack('>IIBBBBB', body)
+        elif chunk_type == b'PLTE':
+            palette = np.frombuffer(body, dtype=np.uint8).reshape(-1, 3)
+        elif chunk_type == b'tRNS':
+            transparency = np.frombuffer(body, dtype=np.uint8)
+        elif chunk_type == b'IDAT':
+            idat.append(body)
+        elif chunk_type == b'IEND':
+            break
+    if header is None:
+        raise ValueError("PNG without IHDR")
+    width, height, bit_depth, color_type, _, _, interlace = header
+    if interlace or color_type not in PNG_CHANNELS:
+        raise ValueError(f"unsupported PNG (color type {color_type}, interlace {interlace})")
+
+    channels = PNG_CHANNELS[color_type]
+    stride = (width * channels * bit_depth + 7) // 8
+    pixels = unfilter(zlib.decompress(b''.join(idat)), height, stride, max(1, channels * bit_depth // 8))
+
+    if bit_depth < 8:
+        shifts = np.arange(8 - bit_depth, -1, -bit_depth, dtype=np.uint8)
+        samples = ((pixels[:, :, None] >> shifts) & ((1 << bit_depth) - 1)).reshape(height, -1)[:, :width]
+    elif bit_depth == 16:
+        samples = pixels.reshape(height, -1, 2)[:, :, 0]
+    else:
+        samples = pixels
+    samples = samples.reshape(height, width, channels)
+
+    if color_type == 3:
+        if palette is None:
+            raise ValueError("palette PNG without PLTE")
+        table = np.full((256, 4), 255, dtype=np.uint8)
+        table[:len(palette), :3] = palette
+        if transparency is not None:
+            table[:len(transparency), 3] = transparency
+        return table[samples[:, :, 0]]
+
+    if color_type in (0, 4) and bit_depth < 8:
+        samples = samples * (255 // ((1 << bit_depth) - 1))
+    rgba = np.full((height, width, 4), 255, dtype=np.uint8)
+    if color_type in (0, 4):
+        rgba[:, :, :3] = samples[:, :, :1]
+        if color_type == 4:
+            rgba[:, :, 3] = samples[:, :, 1]
+    else:
+        rgba[:, :, :channels] = samples
+    return rgba
+
+
+def crop_ancestor(rgba: np.ndarray, dz: int, x: int, y: int) -> np.ndarray:
+    """The part of an ancestor dz levels up covering tile (x, y), scaled back to full size."""
+    scale = 1 << dz
+    span = rgba.shape[0] // scale
+    left, top = (x % scale) * span, (y % scale) * span
+    return rgba[top:top + span, left:left + span].repeat(scale, axis=0).repeat(scale, axis=1)
+
+
+def mosaic(children: List[Optional[np.ndarray]]) -> np.ndarray:
+    """
+    Downsample four children (NW, NE, SW, SE; None = transparent) into one tile.
+
+    Each 2x2 block is averaged with alpha weighting, so transparent quadrants
+    do not darken the edges of the ones that exist.
+    """
+    size = next(child.shape[0] for child in children if child is not None)
+    canvas = np.zeros((2 * size, 2 * size, 4), dtype=np.float64)
+    for i, child in enumerate(children):
+        if child is not None and child.shape[:2] == (size, size):
+            top, left = (i // 2) * size, (i % 2) * size
+            canvas[top:top + size, left:left + size] = child
+    alpha = canvas[:, :, 3:]
+    blocks = np.concatenate([canvas[:, :, :3] * alpha, alpha], axis=2).reshape(size, 2, size, 2, 4).sum(axis=(1, 3))
+    rgba = np.empty((size, size, 4), dtype=np.float64)
+    rgba[:, :, :3] = blocks[:, :, :3] / np.maximum(blocks[:, :, 3:], 1.0)
+    rgba[:, :, 3] = blocks[:, :, 3] / 4.0
+    return rgba.round().astype(np.uint8)
+
+
+def overzoom(read_tile: Callable, z: int, x: int, y: int, levels: int) -> Optional[np.ndarray]:
+    """Tile cut from the nearest stored ancestor at most levels up; None if there is none."""
+    for dz in range(1, min(levels, z) + 1):
+        data = read_tile(z - dz, x >> dz, y >> dz)
+        if data:
+            rgba = decode_png(data)
+            if rgba.shape[0] >> dz:
+                return crop_ancestor(rgba, dz, x, y)
+    return None
+
+
+def underzoom(read_tile: Callable, z: int, x: int, y: int, levels: int) -> Optional[np.ndarray]:
+    """Tile built from stored descendants at most levels down; None if there are none."""
+    if levels <= 0:
+        return None
+    children = []
+    for child_y in (2 * y, 2 * y + 1):
+        for child_x in (2 * x, 2 * x + 1):
+            data = read_tile(z + 1, child_x, child_y)
+            children.append(decode_png(data) if data
+                            else underzoom(read_tile, z + 1, child_x, child_y, levels - 1))
+    if all(child is None for child in children):
+        return None
+    return mosaic(children)
+
+
+def synthesize_tile(read_tile: Callable, z: int, x: int, y: int,
+                    max_overzoom: int, max_underzoom: int) -> Optional[bytes]:
+    """
+    PNG for a tile that is not stored, or None if no nearby zoom covers it.
+
+    read_tile(z, x, y) returns stored tile bytes or None. The nearest ancestor
+    is tried first (it is one read), then the descendants.
+    """
+    rgba = overzoom(read_tile, z, x, y, max_overzoom)
+    if rgba is None:
+        rgba = underzoom(read_tile, z, x, y, max_underzoom)
+    return None if rgba is None else encode_png(rgba)
@@ -0,0 +1,161 @@
+"""
+Compact columnar wire format for fire_update frames.
+Packs a batch of playback records into little-endian typed arrays with
+dictionary-encoded text fields, sent as a Socket.IO binary attachment.
+"""
+
+import sys
+import json
+import calendar
+from array import array
+from datetime import datetime
+from typing import Dict, List, Any, Tuple
+
+# Encodings a client can negotiate with 'encoding' in start_playback
+ENCODINGS = ('json', 'binary')
+DEFAULT_ENCODING = 'json'
+
+FRAME_VERSION = 'columnar-v1'
+
+# HTTP stream formats and their content types
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'binary': 'application/octet-stream'
+}
+
+# Packed columns in frame order: (field, array typecode, wire dtype).
+# 4-byte columns come first so every typed array view is 4-byte aligned.
+NUMERIC_COLUMNS = [
+    ('id', 'I', 'uint32'),
+    ('time_offset', 'i', 'int32'),
+    ('latitude', 'f', 'float32'),
+    ('longitude', 'f', 'float32'),
+    ('brightness', 'f', 'float32'),
+    ('bright_t31', 'f', 'float32'),
+    ('frp', 'f', 'float32'),
+    ('scan', 'f', 'float32'),
+    ('track', 'f', 'float32'),
+    ('type', 'B', 'uint8')
+]
+
+# Text columns sent as uint8 codes into a per-frame dictionary
+DICTIONARY_COLUMNS = ['confidence', 'satellite', 'instrument', 'daynight', 'version']
+
+
+def get_frame_layout() -> Dict[str, Any]:
+    """
+    Column layout of binary frames, sent once to clients in the config event.
+
+    A frame holds only the columns of the session's projected fields, in this
+    order (time_offset is derived from datetime_utc, which is always sent).
+    """
+    columns = [[name, dtype] for name, _, dtype in NUMERIC_COLUMNS]
+    columns += [[name, 'uint8'] for name in DICTIONARY_COLUMNS]
+    return {'encoding': FRAME_VERSION, 'byte_order': 'little', 'columns': columns}
+
+
+def to_epoch(value: str) -> int:
+    """Convert a 'YYYY-MM-DD HH:MM:SS' / ISO UTC string to epoch seconds."""
+    return calendar.timegm(datetime.fromisoformat(value).timetuple())
+
+
+def pack_column(typecode: str, values: List[Any]) -> bytes:
+    """Pack values into little-endian bytes for one column."""
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def pack_records(records: List[Dict[str, Any]], frame_epoch: int) -> Tuple[bytes, Dict[str, List[str]]]:
+    """Pack fire records into (columns back to back in get_frame_layout() order, dictionaries)."""
+    fields = set(records[0]) if records else set()
+
+    chunks = []
+    for name, typecode, _ in NUMERIC_COLUMNS:
+        if name == 'time_offset':
+            values = [to_epoch(record['datetime_utc']) - frame_epoch for record in records]
+        elif name in fields:
+            values = [record[name] or 0 for record in records]
+        else:
+            continue
+        chunks.append(pack_column(typecode, values))
+
+    dictionaries = {}
+    for name in DICTIONARY_COLUMNS:
+        if name not in fields:
+            continue
+        labels: Dict[str, int] = {}
+        codes = [labels.setdefault(str(record[name]), len(labels)) for record in records]
+        if len(labels) > 256:
+            raise ValueError(f"Too many distinct {name} values for a uint8 dictionary")
+        chunks.append(pack_column('B', codes))
+        dictionaries[name] = list(labels)
+    return b''.join(chunks), dictionaries
+
+
+def encode_fire_update(emit_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Encode a fire_update payload as a columnar binary frame.
+
+    Returns the event payload: JSON metadata (timestamp, statistics, record
+    count, dictionaries) plus a 'frame' bytes attachment holding the packed
+    columns back to back in get_frame_layout() order.
+    Record times are int32 second offsets from the frame timestamp, and
+    expired marker ids are sent as a packed uint32 'expired' attachment.
+    A keyframe's 'active' set is packed the same way into 'active_frame'
+    (with 'active_count' and 'active_dictionaries').
+    """
+    records = emit_data['fires']
+    frame_epoch = to_epoch(emit_data['timestamp'])
+    frame, dictionaries = pack_records(records, frame_epoch)
+
+    payload = {key: value for key, value in emit_data.items() if key not in ('fires', 'active')}
+    payload.update({
+        'encoding': FRAME_VERSION,
+        'count': len(records),
+        'fade_duration': records[0].get('fade_duration') if records else None,
+        'dictionaries': dictionaries,
+        'expired': pack_column('I', emit_data.get('expired', [])),
+        'frame': frame
+    })
+    if 'active' in emit_data:
+        active_frame, active_dictionaries = pack_records(emit_data['active'], frame_epoch)
+        payload.update({
+            'active_count': len(emit_data['active']),
+            'active_dictionaries': active_dictionaries,
+            'active_frame': active_frame
+        })
+        if payload['fade_duration'] is None and emit_data['active']:
+            payload['fade_duration'] = emit_data['active'][0].get('fade_duration')
+    return payload
+
+
+def encode_payload(emit_data: Dict[str, Any], encoding: str) -> Dict[str, Any]:
+    """Return the fire_update payload in the requested encoding."""
+    if encoding == 'binary':
+        return encode_fire_update(emit_data)
+    return emit_data
+
+
+def encode_stream_record(event: str, payload: Dict[str, Any], stream_format: str) -> bytes:
+    """
+    Frame one event for an HTTP stream.
+
+    ndjson: one {"event", "data"} JSON object per line. binary: a uint32 header
+    length, a JSON header ({"event", "data", "attachments": [[name, length]]})
+    and the payload's byte attachments back to back, with fire_update frames
+    in the columnar encoding (any payload with 'fires' records is packed).
+    """
+    if stream_format == 'ndjson':
+        return json.dumps({'event': event, 'data': payload}, separators=(',', ':')).encode('utf-8') + b'\n'
+
+    if 'fires' in payload:
+        payload = encode_fire_update(payload)
+    attachments = {key: value for key, value in payload.items() if isinstance(value, bytes)}
+    header = json.dumps({
+        'event': event,
+        'data': {key: value for key, value in payload.items() if key not in attachments},
+        'attachments': [[key, len(value)] for key, value in attachments.items()]
+    }, separators=(',', ':')).encode('utf-8')
+    return pack_column('I', [len(header)]) + header + b''.join(attachments.values())